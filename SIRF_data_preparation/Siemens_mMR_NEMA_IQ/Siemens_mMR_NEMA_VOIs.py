@@ -5,7 +5,6 @@ import os
 from pathlib import Path
 
 import matplotlib.pyplot as plt
-from data_QC import VOI_mean
 from scipy.ndimage import binary_erosion
 
 import sirf.STIR as STIR
@@ -78,6 +77,13 @@ data_QC.plot_image(reference_image, **slices, alpha=allVOIs)
 
 # %%
 data_QC.VOI_checks(['VOI_whole_object', 'VOI_sphere5'], OSEM_image, srcdir=os.path.join(datadir, 'PETRIC'), **slices)
+
+
+# %%
+def VOI_mean(image, VOI):
+    return float((image * VOI).sum() / VOI.sum())
+
+
 # %%
 [VOI_mean(OSEM_image, VOI) for VOI in VOIs]
 # %%
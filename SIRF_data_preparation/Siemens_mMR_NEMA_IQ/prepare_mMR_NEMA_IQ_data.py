@@ -15,6 +15,9 @@ if __name__ == '__main__':
     parser.add_argument('--start', type=float, default=0)
     parser.add_argument('--end', type=float, default=500)
     parser.add_argument('--raw_data_path', type=str, default=None)
+    parser.add_argument('--chunks', type=int, default=1, help='number of time-frame chunks to histogram separately')
+    parser.add_argument('--jobs', type=int, default=1, help='number of chunks to histogram in parallel')
+    parser.add_argument('--force', action='store_true', help='recompute all (cached) preparation stages')
     args = parser.parse_args()
 
     if args.log in ['debug', 'info', 'warning', 'error', 'critical']:
@@ -46,4 +49,5 @@ if __name__ == '__main__':
     prepare_challenge_Siemens_data(data_path, challenge_data_path, intermediate_data_path, '20170809_NEMA_',
                                    '60min_UCL.l.hdr', 'MUMAP_UCL.v', 'MUMAP_UCL.hv', 'UCL.n', 'norm.n.hdr', f_template,
                                    'prompts', 'mult_factors', 'additive_term', 'randoms', 'attenuation_factor',
-                                   'attenuation_correction_factor', 'scatter', start, end)
+                                   'attenuation_correction_factor', 'scatter', start, end, chunks=args.chunks,
+                                   jobs=args.jobs, force=args.force)
@@ -0,0 +1,244 @@
+"""
+Library of functions to create PETRIC VOIs (NEMA IQ & Hoffman phantoms), see `create_VOIs.py`
+NB: `sirf` is imported by the functions using it, i.e. array-only functions (e.g. `connected_component`) do not need it.
+"""
+# Copyright 2024 University College London
+# Licence: Apache-2.0
+from __future__ import annotations
+
+import logging
+import os
+import typing
+from concurrent.futures import Executor
+from pathlib import Path
+from zipfile import ZipFile
+
+import numpy as np
+import numpy.typing as npt
+import scipy.ndimage as ndimage
+
+if typing.TYPE_CHECKING:
+    import sirf.STIR as STIR
+
+log = logging.getLogger('VOI_utilities')
+#: per-dataset arguments of `create_NEMA_IQ_VOIs` ("NEMA_IQ") or `register_Hoffman_VOIs` ("Hoffman")
+VOI_SETTINGS: dict[str, tuple[str, dict]] = {
+    'GE_D690_NEMA_IQ': ("NEMA_IQ", {'central_VOI': False, 'angle_smallest_sphere': 30, 'spheres': (2, 3, 5)}),
+    'GE_DMI4_NEMA_IQ': ("NEMA_IQ", {'central_VOI': False, 'angle_smallest_sphere': 30, 'spheres': (2, 3, 4)}),
+    'NeuroLF_Hoffman_Dataset': ("Hoffman", {}), 'Siemens_Vision600_Hoffman': ("Hoffman", {})}
+#: names of the VOIs returned by `create_Hoffman_VOIs` (in order)
+HOFFMAN_VOI_NAMES = ["whole_object", "background", "GM", "WM", "ventricles"]
+
+
+def connected_component(arr: npt.NDArray[bool], order=0) -> npt.NDArray[bool]:
+    """
+    Return connected component of a given order in an array. order=0 returns the largest.
+    NB: components are ranked by a single `np.bincount` of the labels (i.e. O(voxels), not O(labels * voxels)).
+    """
+    labels, num_labels = ndimage.label(arr)
+    if order >= num_labels:
+        raise ValueError(f"order {order} requested but only {num_labels} connected components")
+    sizes = np.bincount(labels.ravel(), minlength=num_labels + 1)
+    sizes[0] = -1  # background
+    idx = np.argsort(sizes, kind="stable")[-1 - order]
+    return labels == idx
+
+
+def build_regions(regions: dict[str, typing.Callable[..., npt.NDArray[bool]]], *args,
+                  executor: Executor | None = None) -> dict[str, npt.NDArray[bool]]:
+    """
+    Returns `{name: region(*args)}` for all `regions`, computed in parallel if `executor` is given.
+    NB: with a process pool, `regions` must be module-level functions and `args` picklable (e.g. numpy arrays).
+    """
+    if executor is None:
+        return {name: region(*args) for name, region in regions.items()}
+    futures = {name: executor.submit(region, *args) for name, region in regions.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def to_image(template: STIR.ImageData, arr: npt.NDArray) -> STIR.ImageData:
+    """Returns an image like `template` filled with `arr`"""
+    return template.allocate(0).fill(arr.astype(np.float32))
+
+
+def write_PETRIC_VOIs(VOIs: typing.Iterable[STIR.ImageData], VOInames: typing.Iterable[str], srcdir: Path):
+    """Writes `VOIs` as `srcdir/PETRIC/VOI_{name}.hv`"""
+    datadir = Path(srcdir) / "PETRIC"
+    log.info("Writing VOIs to %s", datadir)
+    os.makedirs(datadir, exist_ok=True)
+    for VOI, n in zip(VOIs, VOInames):
+        VOI.write(str(datadir / f"VOI_{n}"))
+
+
+# %% NEMA IQ phantom
+def read_unregistered_VOIs(intermediate_datadir: Path) -> typing.List[STIR.ImageData]:
+    import sirf.STIR as STIR
+
+    return [STIR.ImageData(str(intermediate_datadir / f"unregistered_sphere{i}.nii")) for i in range(1, 8)]
+
+
+def read_orgVOIs(intermediate_datadir: Path) -> typing.List[STIR.ImageData]:
+    import sirf.STIR as STIR
+
+    return [STIR.ImageData(str(intermediate_datadir / f"S{i}.nii")) for i in range(1, 8)]
+
+
+def whole_object_arr(ref_arr: npt.NDArray[np.float32]) -> npt.NDArray[bool]:
+    """Eroded region above 1/20 of the 99th percentile"""
+    return ndimage.binary_erosion(ref_arr > np.percentile(ref_arr, 99) / 20, iterations=2)
+
+
+def create_whole_object_mask(reference_image: STIR.ImageData) -> STIR.ImageData:
+    return to_image(reference_image, whole_object_arr(reference_image.as_array()))
+
+
+def create_background_VOI(orgVOIs: typing.List[STIR.ImageData], central_VOI: bool) -> STIR.ImageData:
+    if central_VOI:
+        return orgVOIs[6]
+    # This is the NEMA with "lung" so need to move background somewhere else
+    # will use the largest sphere VOI and shift it down
+    background_mask = orgVOIs[5].clone()
+    background_arr = background_mask.as_array()
+    z_voxel_size = background_mask.voxel_sizes()[0]
+    # 37 mm diameter
+    z_shift = int(np.floor(37 * 1.2 / z_voxel_size))
+    background_arr = np.concatenate((
+        background_arr[0:z_shift, :, :] * 0,
+        background_arr[0:-z_shift, :, :],
+    ))
+    background_mask.fill(background_arr)
+    return background_mask
+
+
+def create_NEMA_IQ_VOIs(
+        srcdir: Path, intermediate_data_path: Path, central_VOI: bool = True, angle_smallest_sphere: float = 210,
+        spheres=(1, 3, 5),
+        executor: Executor | None = None) -> typing.Tuple[typing.List[STIR.ImageData], typing.List[str]]:
+    """
+    Returns VOIs (whole object, background & `spheres` (1 is smallest)) & their names for the OSEM image in `srcdir`.
+    NB: the whole object mask is computed in `executor` (if given) while generating the sphere VOIs.
+    """
+    import sirf.contrib.NEMA.generate_nema_rois as generate_nema_rois
+    import sirf.STIR as STIR
+
+    reference_image = STIR.ImageData(str(srcdir / 'OSEM_image.hv'))
+    ref_arr = reference_image.as_array()
+    whole_object = None if executor is None else executor.submit(whole_object_arr, ref_arr)
+    thresholded_image = reference_image.clone()
+    thresholded_image.fill(np.where(ref_arr < ref_arr.max() / 5, 0, ref_arr))
+    # currently needs trailing slash
+    generate_nema_rois.data_output_path = str(intermediate_data_path) + "/"
+    generate_nema_rois.generate_nema_rois(thresholded_image, angle_smallest=angle_smallest_sphere)
+    orgVOIs = read_orgVOIs(intermediate_data_path)
+
+    whole_object_mask = to_image(reference_image,
+                                 whole_object_arr(ref_arr) if whole_object is None else whole_object.result())
+    VOIs = [whole_object_mask, create_background_VOI(orgVOIs, central_VOI)] + [orgVOIs[i - 1] for i in spheres]
+    return VOIs, ["whole_object", "background"] + [f"sphere{s}" for s in spheres]
+
+
+# %% Hoffman phantom
+def read_and_downsample_Hoffman(downloaddir: Path) -> STIR.ImageData:
+    import requests
+    import sirf.STIR as STIR
+
+    # Download DICOM data
+    name = "3D_DRO_Hoffman_v6_20160331_DICOM"
+    Hoffman_dicom_dir = downloaddir / name / "3D_DRO_Hoffman_v6_20160331"
+    Hoffman_dicom_filename = Hoffman_dicom_dir / "000001"
+    if not Hoffman_dicom_filename.is_file():
+        fname = name + ".zip"
+        full_fname = downloaddir / fname
+        url = "https://depts.washington.edu/petctdro/downloads/" + fname
+        r = requests.get(url)
+        with open(full_fname, "wb") as f:
+            f.write(r.content)
+        file = ZipFile(full_fname)
+        file.extractall(downloaddir)
+    # read
+    orgHoffman = STIR.ImageData(str(Hoffman_dicom_filename))
+    # combine voxels
+    # combine 5 slices, as this data "simulates" a 1:5 contrast
+    # also combine 2x2 in-plane pixels as voxel-size is quite small for PET
+    zooms = (1.0 / 5, 1.0 / 2, 1.0 / 2)
+    Hoffman = orgHoffman.zoom_image(
+        zooms=zooms,
+        offsets_in_mm=(0, 0, 0),
+        size=tuple([np.ceil(d * z) for z, d in zip(zooms, orgHoffman.dimensions())]),
+        scaling="preserve_values",
+    )
+    return Hoffman
+
+
+def Hoffman_whole_object(Hoffman_arr: npt.NDArray[np.float32]) -> npt.NDArray[bool]:
+    # we want to use ndimage.ndimage.binary_fill_holes to find the whole object. However,
+    # that function does not fill holes connected to the boundary, so let's
+    # fill the "bottom" boundary plane first, fill the holes, and then reset the boundary
+    Hoffman_arr = Hoffman_arr.copy()
+    Hoffman_arr[-9:-1, :, :] = 1
+    whole_object_arr = ndimage.binary_fill_holes(Hoffman_arr > 0.0)
+    whole_object_arr[-9:-1, :, :] = False
+    # get rid over 1 layer of outside voxels
+    return ndimage.binary_erosion(whole_object_arr, iterations=1)
+
+
+# Regions (for `build_regions`) of the Hoffman image (masked by the whole object)
+def Hoffman_GM(Hoffman_arr: npt.NDArray[np.float32], whole_object_arr: npt.NDArray[bool]) -> npt.NDArray[bool]:
+    return Hoffman_arr > 0.85
+
+
+def Hoffman_WM(Hoffman_arr: npt.NDArray[np.float32], whole_object_arr: npt.NDArray[bool]) -> npt.NDArray[bool]:
+    inner_arr = ndimage.binary_erosion(whole_object_arr, iterations=4)
+    return np.logical_and(np.logical_and(Hoffman_arr <= 0.85, Hoffman_arr >= 0.15), inner_arr)
+
+
+def Hoffman_ventricles(Hoffman_arr: npt.NDArray[np.float32], whole_object_arr: npt.NDArray[bool]) -> npt.NDArray[bool]:
+    return connected_component(np.logical_and(Hoffman_arr <= 0.01, whole_object_arr))
+
+
+def Hoffman_background(Hoffman_arr: npt.NDArray[np.float32], whole_object_arr: npt.NDArray[bool]) -> npt.NDArray[bool]:
+    """"WM background" region by eroding WM"""
+    return ndimage.binary_erosion(Hoffman_WM(Hoffman_arr, whole_object_arr), iterations=2)
+
+
+HOFFMAN_REGIONS = {
+    "background": Hoffman_background, "GM": Hoffman_GM, "WM": Hoffman_WM, "ventricles": Hoffman_ventricles}
+
+
+def create_Hoffman_VOIs(
+        Hoffman: STIR.ImageData,
+        executor: Executor | None = None) -> typing.Tuple[typing.List[STIR.ImageData], typing.List[str]]:
+    """
+    Create VOIs using thresholding etc. Requires that 5 slices were combined to get averages.
+    Regions other than the whole object are computed in `executor` (if given).
+    """
+    Hoffman_arr = Hoffman.as_array()
+    whole_object_arr = Hoffman_whole_object(Hoffman_arr)
+    regions = build_regions(HOFFMAN_REGIONS, Hoffman_arr * whole_object_arr, whole_object_arr, executor=executor)
+    regions["whole_object"] = whole_object_arr
+    return [to_image(Hoffman, regions[n]) for n in HOFFMAN_VOI_NAMES], HOFFMAN_VOI_NAMES
+
+
+def register_Hoffman_VOIs(Hoffman_outdir: Path, srcdir: Path, intermediate_data_path: Path,
+                          VOInames=HOFFMAN_VOI_NAMES) -> typing.List[STIR.ImageData]:
+    """
+    Returns the VOIs (as written by `create_Hoffman_VOIs.py` in `Hoffman_outdir`) registered to the OSEM image in
+    `srcdir`, writing intermediate files in `intermediate_data_path`.
+    """
+    import sirf.Reg as Reg
+    import sirf.STIR as STIR
+    from SIRF_data_preparation.registration_utilities import STIR_to_nii, STIR_to_nii_hv, register_it, resample_STIR
+
+    VOIs_nii = [Reg.ImageData(str(Hoffman_outdir / f"{n}.nii")) for n in VOInames]
+    OSEM_image = STIR.ImageData(str(srcdir / "OSEM_image.hv"))
+    OSEM_image_nii = STIR_to_nii(OSEM_image, os.path.join(intermediate_data_path, "OSEM_image.nii"))
+    # Construct ground-truth image and register
+    # The PET image is obtained by filling the phantom which has plastic slices giving "apparent" contrast.
+    # Should be 4:1, but from this phantom, it seems 5:1 (doesn't matter for the registration)
+    VOI_GM = STIR.ImageData(str(Hoffman_outdir / "GM.hv"))
+    VOI_WM = STIR.ImageData(str(Hoffman_outdir / "WM.hv"))
+    orgGT_nii = STIR_to_nii_hv(VOI_GM*5 + VOI_WM*1, os.path.join(intermediate_data_path, "orgGT"))
+    _, resampler, _ = register_it(OSEM_image_nii, orgGT_nii)
+    resample_STIR(resampler, orgGT_nii, os.path.join(intermediate_data_path, "regGT"))
+    datadir = Path(intermediate_data_path)
+    return [resample_STIR(resampler, VOI, str(datadir / ("reg"+n))) for VOI, n in zip(VOIs_nii, VOInames)]
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Benchmark example submissions (`main_*.py`) on PETRIC datasets
+
+Runs each submission on each dataset (in a fresh process), recording setup time, per-update cost,
+time-to-threshold (see `QualityMetrics.THRESHOLD`) and peak memory.
+Prints a comparison table and writes JSON for regression tracking.
+
+Usage:
+  benchmark.py [options] [<data_set>...]
+
+Arguments:
+  <data_set>  dataset names (in SRCDIR) or paths (default: all datasets in SRCDIR)
+
+Options:
+  --submissions=<s>  comma-separated submission modules [default: main_OSEM,main_BSREM,main_ISTA]
+  --seconds=<t>      timeout per run (excluding metrics) [default: 600]
+  --outdir=<path>    output directory (default: OUTDIR/benchmark)
+  --json=<filename>  results file (default: <outdir>/benchmark.json)
+  --baseline=<json>  previous results to compare against
+  --tolerance=<f>    relative slow-down w.r.t. baseline to report as a regression [default: 0.1]
+  --log=<level>      logging level [default: INFO]
+"""
+# Copyright 2024 University College London
+# Licence: Apache-2.0
+__version__ = '0.1.0'
+
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from docopt import docopt
+
+log = logging.getLogger('benchmark')
+#: (key, header, format) of table columns
+COLUMNS = [("submission", "submission", "{}"), ("dataset", "dataset", "{}"), ("status", "status", "{}"),
+           ("iterations", "iters", "{:d}"), ("setup_time", "setup [s]", "{:.1f}"),
+           ("update_time", "update [s]", "{:.3f}"), ("pass_time", "pass [s]", "{:.1f}"),
+           ("pass_iteration", "pass iter", "{:d}"), ("peak_rss", "RSS [MB]", "{:.0f}")]
+#: keys compared against baseline (lower is better)
+REGRESSION_KEYS = ["setup_time", "update_time", "pass_time", "peak_rss"]
+
+
+def run_benchmark(submission: str, srcdir: Path, outdir: Path, seconds: float) -> dict:
+    """
+    `petric.run_submission` in a fresh (spawned) process, so that imports & peak memory are isolated.
+    NB: `update_time` excludes `Submission(data)` (i.e. `init_time`).
+    """
+    from petric_tools.parallel import run_isolated
+
+    summary = run_isolated(srcdir, outdir, submission, seconds=seconds)
+    summary.update(submission=submission, dataset=srcdir.name)
+    if summary["iterations"] > 0:
+        summary["update_time"] = (summary["time"] - summary["init_time"]) / summary["iterations"]
+    return summary
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float = 0.1) -> list[str]:
+    """
+    Adds `{key}_ratio` (w.r.t. matching `baseline` runs) to `results`.
+    Returns descriptions of regressions (ratio > 1 + tolerance).
+    """
+    base = {(res["submission"], res["dataset"]): res for res in baseline}
+    regressions = []
+    for res in results:
+        if (prev := base.get((res["submission"], res["dataset"]))) is None:
+            continue
+        for key in REGRESSION_KEYS:
+            if res.get(key) is not None and prev.get(key):
+                res[f"{key}_ratio"] = ratio = res[key] / prev[key]
+                if ratio > 1 + tolerance:
+                    regressions.append(f"{res['submission']}/{res['dataset']}: {key} {prev[key]:.3g} -> {res[key]:.3g}")
+        if prev.get("pass_time") is not None and res.get("pass_time") is None:
+            regressions.append(f"{res['submission']}/{res['dataset']}: no longer passes thresholds")
+    return regressions
+
+
+def table(results: list[dict]) -> str:
+    """Plain-text comparison table of `results`"""
+    rows = [[header for _, header, _ in COLUMNS]]
+    rows.extend(["-" if res.get(key) is None else fmt.format(res[key]) for key, _, fmt in COLUMNS] for res in results)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(COLUMNS))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+def metadata(**kwargs) -> dict:
+    """Machine & code information for reproducibility"""
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "date": datetime.now(timezone.utc).isoformat(), "revision": revision, "python": sys.version.split()[0],
+        "platform": platform.platform(), "processor": platform.processor(), "cpu_count": os.cpu_count(), **kwargs}
+
+
+if __name__ == "__main__":
+    args = docopt(__doc__, version=__version__)
+    logging.basicConfig(level=getattr(logging, args["--log"].upper()))
+    from petric import OUTDIR, SRCDIR, data_dirs
+
+    srcdirs = [Path(d) if Path(d).is_dir() else SRCDIR / d for d in args["<data_set>"]]
+    srcdirs = srcdirs or [srcdir for srcdir, _ in data_dirs]
+    submissions = args["--submissions"].split(",")
+    seconds = float(args["--seconds"])
+    outdir = Path(args["--outdir"] or OUTDIR / "benchmark")
+    json_file = Path(args["--json"] or outdir / "benchmark.json")
+
+    results = []
+    for submission in submissions:
+        for srcdir in srcdirs:
+            log.info("benchmarking %s on %s", submission, srcdir.name)
+            results.append(run_benchmark(submission, srcdir, outdir / submission / srcdir.name, seconds))
+    regressions = []
+    if args["--baseline"]:
+        baseline = json.loads(Path(args["--baseline"]).read_text())["results"]
+        regressions = compare(results, baseline, float(args["--tolerance"]))
+
+    print(table(results))
+    json_file.parent.mkdir(parents=True, exist_ok=True)
+    json_file.write_text(
+        json.dumps({"metadata": metadata(seconds=seconds), "results": results, "regressions": regressions}, indent=2))
+    log.info("written %s", json_file)
+    for regression in regressions:
+        log.warning("regression: %s", regression)
+    sys.exit(1 if regressions else 0)
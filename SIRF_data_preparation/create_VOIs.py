@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""Create PETRIC VOIs for several datasets in parallel
+
+Uses `VOI_utilities.VOI_SETTINGS` for the phantom type (NEMA IQ or Hoffman) & settings of each dataset.
+The (dataset-independent) Hoffman VOIs are created once, and then registered to each Hoffman dataset.
+Figures are saved but (unlike with `create_*_VOIs.py`) not shown.
+
+Usage:
+  create_VOIs.py [options] [<dataset>...]
+
+Arguments:
+  <dataset>  dataset names (default: all in `VOI_SETTINGS`)
+
+Options:
+  -j <n>, --jobs=<n>            number of datasets to process in parallel [default: 1]
+  -r <n>, --region_jobs=<n>     number of processes to create the regions of a phantom [default: 1]
+  -s, --skip_write_PETRIC_VOIs  do not write in data/<dataset>/PETRIC
+  --log=<level>                 logging level [default: INFO]
+"""
+# Copyright 2024 University College London
+# Licence: Apache-2.0
+__version__ = '0.1.0'
+
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from multiprocessing import get_context
+from pathlib import Path
+
+import matplotlib.pyplot as plt
+from docopt import docopt
+
+import sirf.STIR as STIR
+from SIRF_data_preparation.data_QC import VOI_checks, plot_image
+from SIRF_data_preparation.data_utilities import the_data_path, the_orgdata_path
+from SIRF_data_preparation.dataset_settings import get_settings
+from SIRF_data_preparation.VOI_utilities import (
+    HOFFMAN_VOI_NAMES,
+    VOI_SETTINGS,
+    create_Hoffman_VOIs,
+    create_NEMA_IQ_VOIs,
+    read_and_downsample_Hoffman,
+    register_Hoffman_VOIs,
+    write_PETRIC_VOIs,
+)
+
+log = logging.getLogger('create_VOIs')
+
+
+def executor(jobs: int) -> Executor | nullcontext:
+    """Process pool with `jobs` (spawned) workers, or `nullcontext(None)` (i.e. serial) if `jobs <= 1`"""
+    return ProcessPoolExecutor(jobs, mp_context=get_context("spawn")) if jobs > 1 else nullcontext(None)
+
+
+def create_Hoffman_template_VOIs(region_jobs: int = 1) -> Path:
+    """Creates (and writes) the (unregistered) Hoffman VOIs and returns their directory"""
+    from SIRF_data_preparation.registration_utilities import STIR_to_nii_hv
+
+    downloaddir = Path(the_orgdata_path("downloads"))
+    Hoffman_outdir = Path(the_orgdata_path("Hoffman"))
+    os.makedirs(downloaddir, exist_ok=True)
+    os.makedirs(Hoffman_outdir, exist_ok=True)
+    Hoffman = read_and_downsample_Hoffman(downloaddir)
+    with executor(region_jobs) as pool:
+        VOIs, VOInames = create_Hoffman_VOIs(Hoffman, executor=pool)
+    log.info("Writing VOIs to %s", Hoffman_outdir)
+    for VOI, n in zip(VOIs, VOInames):
+        STIR_to_nii_hv(VOI, str(Hoffman_outdir / n))
+        plt.figure()
+        plot_image(VOI, save_name=str(Hoffman_outdir / n))
+        plt.close('all')
+    return Hoffman_outdir
+
+
+def create_dataset_VOIs(scanID: str, write: bool = True, region_jobs: int = 1,
+                        Hoffman_outdir: Path | None = None) -> str:
+    """
+    Creates (and writes) the VOIs of dataset `scanID` according to `VOI_SETTINGS`.
+    Hoffman_outdir: output of `create_Hoffman_template_VOIs` (required for Hoffman datasets).
+    """
+    # NB: also needed in (spawned) workers
+    plt.switch_backend("Agg")
+    phantom, kwargs = VOI_SETTINGS[scanID]
+    srcdir = Path(the_data_path(scanID))
+    intermediate_data_path = Path(the_orgdata_path(scanID, "processing"))
+    os.makedirs(intermediate_data_path, exist_ok=True)
+    log.info("%s: creating %s VOIs", scanID, phantom)
+    if phantom == "NEMA_IQ":
+        with executor(region_jobs) as pool:
+            VOIs, VOInames = create_NEMA_IQ_VOIs(srcdir, intermediate_data_path, executor=pool, **kwargs)
+    elif phantom == "Hoffman":
+        if Hoffman_outdir is None:
+            raise ValueError("Hoffman_outdir is required for Hoffman datasets")
+        VOInames = HOFFMAN_VOI_NAMES
+        VOIs = register_Hoffman_VOIs(Hoffman_outdir, srcdir, intermediate_data_path, VOInames, **kwargs)
+    else:
+        raise ValueError(f"unknown phantom {phantom} for {scanID}")
+    if write:
+        write_PETRIC_VOIs(VOIs, VOInames, srcdir)
+        OSEM_image = STIR.ImageData(str(srcdir / "OSEM_image.hv"))
+        VOI_checks([f"VOI_{n}" for n in VOInames], OSEM_image=OSEM_image, srcdir=srcdir / "PETRIC",
+                   **get_settings(scanID).slices)
+        plt.close('all')
+    return scanID
+
+
+def main(argv=None):
+    args = docopt(__doc__, argv=argv, version=__version__)
+    logging.basicConfig(level=getattr(logging, args["--log"].upper()))
+    plt.switch_backend("Agg")
+    scanIDs = args["<dataset>"] or list(VOI_SETTINGS)
+    if unknown := [scanID for scanID in scanIDs if scanID not in VOI_SETTINGS]:
+        raise SystemExit(f"no VOI settings for {unknown}")
+    jobs, region_jobs = int(args["--jobs"]), int(args["--region_jobs"])
+    Hoffman_outdir = None
+    if any(VOI_SETTINGS[scanID][0] == "Hoffman" for scanID in scanIDs):
+        Hoffman_outdir = create_Hoffman_template_VOIs(region_jobs)
+    with executor(jobs) as pool:
+        kwargs = {
+            "write": not args["--skip_write_PETRIC_VOIs"], "region_jobs": region_jobs, "Hoffman_outdir": Hoffman_outdir}
+        if pool is None:
+            done = [create_dataset_VOIs(scanID, **kwargs) for scanID in scanIDs]
+        else:
+            done = list(pool.map(partial(create_dataset_VOIs, **kwargs), scanIDs))
+    log.info("done with %s", done)
+
+
+if __name__ == '__main__':
+    main()
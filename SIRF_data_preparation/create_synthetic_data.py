@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""Create a synthetic PETRIC dataset (NEMA-like phantom with simulated, noisy data)
+
+Writes `prompts.hs`, `additive_term.hs`, `mult_factors.hs`, `OSEM_image.hv`, `kappa.hv`, `penalisation_factor.txt`
+and `PETRIC/` (`reference_image.hv`, `VOI_whole_object.hv`, `VOI_background.hv` & `VOI_sphere*.hv`),
+e.g. for offline (CPU-only) benchmarks with `benchmark.py`.
+
+Usage:
+  create_synthetic_data.py <data_path> [--help | options]
+
+Arguments:
+  <data_path>  output directory
+
+Options:
+  --scanner=<name>            STIR scanner name [default: Siemens_mMR]
+  --span=<s>                  axial compression [default: 11]
+  --max_ring_diff=<m>         maximum ring difference (default: all)
+  --view_mash_factor=<v>      view mashing (reduces sinogram size) [default: 1]
+  --xy-size=<xy>              image xy-size (default: from scanner)
+  --counts=<c>                expected number of true counts [default: 5e7]
+  --background_fraction=<f>   expected fraction of randoms+scatter in the prompts [default: .3]
+  --contrast=<c>              hot sphere to background activity ratio [default: 4]
+  --penalisation_factor=<p>   RDP penalisation factor [default: 1/700]
+  --reference_updates=<n>     number of BSREM updates for the reference image (0: use phantom) [default: 300]
+  --num_subsets=<n>           number of subsets for OSEM & BSREM [default: 7]
+  --seed=<s>                  random seed [default: 1337]
+"""
+# Copyright 2024 University College London
+# Licence: Apache-2.0
+__version__ = '0.1.0'
+
+import logging
+from fractions import Fraction
+from pathlib import Path
+
+import numpy as np
+from docopt import docopt
+from scipy import ndimage
+
+import sirf.STIR as STIR
+from SIRF_data_preparation.create_initial_images import (
+    OSEM,
+    compute_kappa_image,
+    create_acq_model_and_obj_fun,
+    scale_initial_image,
+)
+
+log = logging.getLogger('create_synthetic_data')
+STIR.AcquisitionData.set_storage_scheme('memory')
+#: linear attenuation coefficients (cm^-1) at 511 keV
+MU_WATER, MU_LUNG = 0.096, 0.03
+
+
+def create_phantom(template_image: STIR.ImageData, contrast: float = 4) -> tuple[np.ndarray, np.ndarray, dict]:
+    """
+    NEMA-like phantom scaled to the FOV of `template_image`: elliptical cylinder, cold "lung" insert & 6 hot spheres
+    of increasing size (with `contrast`) in the central slice.
+    Returns (activity, mu-map, VOI masks).
+    """
+    shape = template_image.dimensions()
+    # coordinates (mm) relative to the centre
+    z, y, x = np.meshgrid(*((np.arange(n) - (n-1) / 2) * vs for n, vs in zip(shape, template_image.voxel_sizes())),
+                          indexing="ij")
+    fov_x, fov_y = -2 * x.min(), -2 * y.min()
+    a, b, c = .4 * fov_x, .3 * fov_y, -.8 * z.min() if shape[0] > 1 else np.inf
+    body = ((x / a)**2 + (y / b)**2 <= 1) & (abs(z) <= c)
+    lung = (x**2 + y**2 <= (.2 * b)**2) & body
+    spheres = {}
+    for i, angle in enumerate(np.linspace(0, 2 * np.pi, 6, endpoint=False)):
+        radius = (.06 + .02*i) * b
+        centre = (.6 * b * np.cos(angle), .6 * b * np.sin(angle))
+        spheres[f"sphere{i + 1}"] = (x - centre[0])**2 + (y - centre[1])**2 + z**2 <= radius**2
+
+    activity = body.astype(np.float32)
+    activity[lung] = 0
+    for sphere in spheres.values():
+        activity[sphere] = contrast
+    mu = np.where(body, MU_WATER, 0).astype(np.float32)
+    mu[lung] = MU_LUNG
+
+    inserts = ndimage.binary_dilation(lung | np.logical_or.reduce(list(spheres.values())), iterations=2)
+    background = ndimage.binary_erosion(body, iterations=2) & ~inserts & (abs(z) <= c / 2)
+    return activity, mu, {"whole_object": body, "background": background, **spheres}
+
+
+def simulate(activity: STIR.ImageData, mu_map: STIR.ImageData, template: STIR.AcquisitionData, counts: float,
+             background_fraction: float, rng: np.random.Generator) -> tuple[STIR.AcquisitionData, ...]:
+    """
+    Returns (prompts, additive_term, mult_factors) simulated from `activity` (scaled in-place to `counts` trues),
+    with attenuation from `mu_map`, random detection efficiencies, uniform randoms+scatter & Poisson noise.
+    """
+    acq_model = STIR.AcquisitionModelUsingParallelproj()
+    attenuation = STIR.AcquisitionSensitivityModel(mu_map, acq_model)
+    attenuation.set_up(template)
+    attenuation_factors = attenuation.forward(template.get_uniform_copy(1))
+    mult_factors = attenuation_factors.clone()
+    mult_factors.fill(attenuation_factors.as_array() * rng.uniform(.8, 1.2, template.shape).astype(np.float32))
+
+    acq_model.set_acquisition_sensitivity(STIR.AcquisitionSensitivityModel(mult_factors))
+    acq_model.set_up(template, activity)
+    trues = acq_model.forward(activity)
+    scale = counts / trues.sum()
+    activity.fill(activity.as_array() * scale)
+    trues_arr = trues.as_array() * scale
+    # NB: additive term is in the same units as `G x` (i.e. before multiplication with `mult_factors`)
+    background = background_fraction / (1-background_fraction) * trues_arr.sum() / trues_arr.size
+    additive_term = mult_factors.clone()
+    additive_term.fill(background / np.maximum(mult_factors.as_array(), 1e-6))
+    prompts = trues.clone()
+    prompts.fill(rng.poisson(trues_arr + background).astype(np.float32))
+    return prompts, additive_term, mult_factors
+
+
+def reference_BSREM(srcdir: Path, num_subsets: int, num_updates: int) -> STIR.ImageData:
+    """Reference (approximate MAP) image using BSREM (as in `run_BSREM.py`) for the dataset in `srcdir`"""
+    from petric import get_data
+    from sirf.contrib.BSREM.BSREM import BSREM1
+    from sirf.contrib.partitioner import partitioner
+
+    data = get_data(srcdir=srcdir, outdir=None)
+    data_sub, _, obj_funs = partitioner.data_partition(data.acquired_data, data.additive_term, data.mult_factors,
+                                                       num_subsets, mode="staggered", initial_image=data.OSEM_image)
+    # WARNING: modifies prior strength with 1/num_subsets (as currently needed for BSREM implementations)
+    data.prior.set_penalisation_factor(data.prior.get_penalisation_factor() / len(obj_funs))
+    data.prior.set_up(data.OSEM_image)
+    # add prior evenly to every objective function
+    for f in obj_funs:
+        f.set_prior(data.prior)
+    algo = BSREM1(data_sub, obj_funs, initial=data.OSEM_image, initial_step_size=.3, relaxation_eta=.01,
+                  update_objective_interval=num_updates)
+    algo.run(num_updates)
+    return algo.get_output()
+
+
+def main(argv=None):
+    args = docopt(__doc__, argv=argv, version=__version__)
+    logging.basicConfig(level=logging.INFO)
+
+    data_path = Path(args['<data_path>'])
+    max_ring_diff = -1 if args['--max_ring_diff'] is None else int(args['--max_ring_diff'])
+    xy_size = None if args['--xy-size'] is None else int(args['--xy-size'])
+    num_subsets = int(args['--num_subsets'])
+    rng = np.random.default_rng(int(args['--seed']))
+    (data_path / "PETRIC").mkdir(parents=True, exist_ok=True)
+    _ = STIR.MessageRedirector(str(data_path / 'info.txt'), str(data_path / 'warnings.txt'))
+
+    template = STIR.AcquisitionData(args['--scanner'], span=int(args['--span']), max_ring_diff=max_ring_diff,
+                                    view_mash_factor=int(args['--view_mash_factor']))
+    template_image = template.create_uniform_image(0, xy_size)
+    log.info("sinogram size %s, image size %s", template.shape, template_image.shape)
+    activity_arr, mu_arr, VOIs = create_phantom(template_image, float(args['--contrast']))
+    activity, mu_map = template_image.clone(), template_image.clone()
+    activity.fill(activity_arr)
+    mu_map.fill(mu_arr)
+    prompts, additive_term, mult_factors = simulate(activity, mu_map, template, float(args['--counts']),
+                                                    float(args['--background_fraction']), rng)
+    prompts.write(str(data_path / 'prompts.hs'))
+    additive_term.write(str(data_path / 'additive_term.hs'))
+    mult_factors.write(str(data_path / 'mult_factors.hs'))
+    np.savetxt(data_path / 'penalisation_factor.txt', [float(Fraction(args['--penalisation_factor']))])
+
+    for name, VOI_arr in VOIs.items():
+        VOI = template_image.clone()
+        VOI.fill(VOI_arr.astype(np.float32))
+        VOI.write(str(data_path / "PETRIC" / f"VOI_{name}.hv"))
+
+    # as in `create_initial_images.py`
+    _, obj_fun = create_acq_model_and_obj_fun(prompts, additive_term, mult_factors, template_image)
+    initial_image = scale_initial_image(prompts, additive_term, mult_factors, template_image, obj_fun)
+    OSEM_image = OSEM(obj_fun, initial_image, num_updates=2 * num_subsets, num_subsets=num_subsets)
+    OSEM_image.write(str(data_path / 'OSEM_image.hv'))
+    compute_kappa_image(obj_fun, OSEM_image).write(str(data_path / 'kappa.hv'))
+
+    if (num_updates := int(args['--reference_updates'])) > 0:
+        reference_image = reference_BSREM(data_path, num_subsets, num_updates)
+    else:
+        reference_image = activity
+    reference_image.write(str(data_path / "PETRIC" / 'reference_image.hv'))
+    log.info("done with %s", data_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,30 @@
 """Basic QC plots
 Reads data in the current directory and makes various plots, saved as .png
 
+Also writes statistics of all arrays, sinogram profiles and VOI values to a JSON report.
+
 Usage:
   data_QC.py [options]
 
 Options:
   -h, --help
   --srcdir=<path>        pathname. Will default to current directory unless dataset is set
-  --skip_sino_profiles   do not plot the sinogram profiles
+  --skip_sino_profiles   do not check/plot the sinograms
   --transverse_slice=<i>  idx [default: -1]
   --coronal_slice=<c>    idx [default: -1]
   --sagittal_slice=<s>   idx [default: -1]
   --dataset=<name>       dataset name. if set, it is used to override default slices
+  --all                  check all datasets in `dataset_settings.DATA_SUBSETS` (implies --no_plots)
+  --report=<file>        JSON report file name (relative to srcdir) [default: QC_report.json]
+  --no_plots             only write the report
 
 Note that -1 one means to use middle of image
 """
 # Copyright 2024 University College London
 # Licence: Apache-2.0
-__version__ = '0.4.0'
+__version__ = '0.5.0'
 
+import json
 import os
 import os.path
 from ast import literal_eval
@@ -28,11 +34,10 @@ import matplotlib.pyplot as plt
 import numpy as np
 import numpy.typing as npt
 from docopt import docopt
-from scipy import ndimage
 
 import sirf.STIR as STIR
 from SIRF_data_preparation.data_utilities import the_data_path
-from SIRF_data_preparation.dataset_settings import get_settings
+from SIRF_data_preparation.dataset_settings import DATA_SUBSETS, get_settings
 
 STIR.AcquisitionData.set_storage_scheme('memory')
 
@@ -46,6 +51,108 @@ def check_values_non_negative(arr: npt.NDArray[np.float32], desc: str):
         raise ValueError(f"{desc}: maximum should be finite")
 
 
+def array_stats(arr: npt.NDArray[np.float32]) -> dict:
+    """min, max, number of NaNs, sum & whether values are non-negative and finite (see `check_values_non_negative`)"""
+    arr_min, arr_max = float(np.min(arr)), float(np.max(arr))
+    nans = int(np.isnan(arr).sum()) if np.isnan(arr_min) or np.isnan(arr_max) else 0
+    return {
+        "min": arr_min, "max": arr_max, "nans": nans, "sum": float(np.sum(arr, dtype=np.float64)),
+        "valid": bool(arr_min >= 0 and np.isfinite(arr_max))}
+
+
+def check_stats(stats: dict, desc: str):
+    """Raises like `check_values_non_negative` for `array_stats`"""
+    if np.isnan(stats["min"]) or stats["min"] < 0:
+        raise ValueError(f"{desc}: minimum should be non-negative but is {stats['min']} (max={stats['max']})")
+    if not np.isfinite(stats["max"]):
+        raise ValueError(f"{desc}: maximum should be finite")
+
+
+def sinogram_profile(arr: npt.NDArray[np.float32], sumaxis=(0, 1), select=0) -> npt.NDArray[np.float64]:
+    """Profile as in `plot_sinogram_profile`"""
+    return np.sum(arr, axis=sumaxis, dtype=np.float64)[select, :]
+
+
+def VOI_stats(VOIs: dict[str, npt.NDArray[np.float32]], images: dict[str, npt.NDArray[np.float32]]) -> dict:
+    """
+    Returns number of voxels, centre-of-mass (in indices) and (VOI-weighted) means of all `images` for all `VOIs`,
+    gathering only the (non-zero) voxels of each VOI (i.e. without full-size temporaries).
+    """
+    res = {}
+    for name, VOI in VOIs.items():
+        idx = np.flatnonzero(VOI)
+        weights = np.take(VOI, idx).astype(np.float64)
+        voxels = weights.sum()
+        res[name] = {
+            "voxels": float(voxels),
+            "COM": [float(coords @ weights / voxels) for coords in np.unravel_index(idx, VOI.shape)],
+            "means": {image: float(np.take(arr, idx) @ weights / voxels)
+                      for image, arr in images.items()}}
+    return res
+
+
+def read_arrays(srcdir, sinograms=True) -> tuple[dict, dict, dict]:
+    """
+    Reads existing data in `srcdir` (prompts, additive_term & mult_factors if `sinograms`),
+    images (OSEM_image, kappa & PETRIC/reference_image) and VOIs (PETRIC/VOI_*) once.
+    Returns (sinogram arrays, images, VOIs), where images & VOIs are dicts of `STIR.ImageData`.
+    """
+    sinos = {}
+    if sinograms:
+        for name in ('prompts', 'additive_term', 'mult_factors'):
+            sinos[name] = STIR.AcquisitionData(os.path.join(srcdir, f'{name}.hs')).as_array()
+    images = {}
+    for name in ('OSEM_image', 'kappa', 'PETRIC/reference_image'):
+        if os.path.isfile(filename := os.path.join(srcdir, f'{name}.hv')):
+            images[os.path.basename(name)] = STIR.ImageData(filename)
+    VOIs = {voi.stem: STIR.ImageData(str(voi)) for voi in sorted(Path(srcdir, 'PETRIC').glob("VOI_*.hv"))}
+    return sinos, images, VOIs
+
+
+def QC_report(sinos: dict, images: dict, VOIs: dict) -> dict:
+    """
+    Statistics (see `array_stats`) of all arrays (incl. background = additive_term * mult_factors),
+    sinogram profiles and VOI values (see `VOI_stats`) of data from `read_arrays`.
+    """
+    arrays = {name: image.as_array() for name, image in images.items()}
+    report: dict = {"stats": {}, "profiles": {}}
+    if sinos:
+        background = np.multiply(sinos['additive_term'], sinos['mult_factors'])
+        for name, arr in (*sinos.items(), ("background", background)):
+            report["stats"][name] = array_stats(arr)
+        report["profiles"] = {
+            "prompts": sinogram_profile(sinos['prompts']).tolist(), "background": sinogram_profile(background).tolist()}
+    for name, arr in arrays.items():
+        report["stats"][name] = array_stats(arr)
+    VOI_arrays = {name: VOI.as_array() for name, VOI in VOIs.items()}
+    for name, arr in VOI_arrays.items():
+        report["stats"][name] = array_stats(arr)
+    report["VOIs"] = VOI_stats(VOI_arrays,
+                               {name: arrays[name]
+                                for name in ('OSEM_image', 'reference_image') if name in arrays})
+    if VOIs:
+        voxel_volume = float(np.prod(next(iter(VOIs.values())).spacing))
+        for stats in report["VOIs"].values():
+            stats["volume"] = stats["voxels"] * voxel_volume
+    return report
+
+
+def check_report(report: dict):
+    """Raises a `ValueError` for (the first) invalid array in `report`"""
+    for name, stats in report["stats"].items():
+        check_stats(stats, name)
+
+
+def plot_profiles(profiles: dict[str, list], srcdir='./'):
+    """Plot the sinogram profiles of a `QC_report`"""
+    plt.figure()
+    ax = plt.subplot(111)
+    for name, profile in profiles.items():
+        plt.plot(profile, label=name)
+    ax.legend()
+    plt.savefig(os.path.join(srcdir, 'prompts_background_profiles.png'))
+
+
 def plot_sinogram_profile(prompts, background, sumaxis=(0, 1), select=0, srcdir='./'):
     """
     Plot a profile through sirf.STIR.AcquisitionData
@@ -112,37 +219,38 @@ def plot_image_if_exists(prefix, **kwargs):
         return None
 
 
-def check_and_plot_image_if_exists(prefix, **kwargs):
-    im = plot_image_if_exists(prefix, **kwargs)
-    if im is not None:
-        check_values_non_negative(im.as_array(), prefix)
-    return im
-
-
-def VOI_mean(image, VOI):
-    return float((image * VOI).sum() / VOI.sum())
-
-
 def VOI_checks(allVOInames, OSEM_image=None, reference_image=None, srcdir='.', **kwargs):
     if len(allVOInames) == 0:
         return
-    OSEM_VOI_values = []
-    ref_VOI_values = []
-    allVOIs = None
-    VOIkwargs = kwargs.copy()
-    VOIkwargs['vmax'] = 1
-    VOIkwargs['vmin'] = 0
+    VOIs = {}
     for VOIname in allVOInames:
-        prefix = os.path.join(srcdir, VOIname)
-        filename = prefix + '.hv'
+        filename = os.path.join(srcdir, VOIname + '.hv')
         if not os.path.isfile(filename):
             print(f"VOI {VOIname} does not exist")
             continue
-        VOI = STIR.ImageData(filename)
-        VOI_arr = VOI.as_array()
-        check_values_non_negative(VOI_arr, VOIname)
-        COM = np.rint(ndimage.center_of_mass(VOI_arr))
-        num_voxels = VOI_arr.sum()
+        VOIs[VOIname] = STIR.ImageData(filename)
+    images = {"OSEM_image": OSEM_image, "reference_image": reference_image}
+    plot_VOIs(VOIs, {name: image for name, image in images.items() if image is not None}, srcdir, **kwargs)
+
+
+def plot_VOIs(VOIs: dict, images: dict, srcdir='.', report: dict | None = None, **kwargs):
+    """
+    Checks, prints & plots `VOIs` (dict of `STIR.ImageData`), using `images["OSEM_image"]` for overlays
+    and printing VOI means of `images`. Uses VOI statistics in `report` if given (see `QC_report`).
+    """
+    if report is None:
+        VOI_arrays = {name: VOI.as_array() for name, VOI in VOIs.items()}
+        for name, arr in VOI_arrays.items():
+            check_values_non_negative(arr, name)
+        VOI_values = VOI_stats(VOI_arrays, {name: image.as_array() for name, image in images.items()})
+    else:
+        VOI_values = report["VOIs"]
+    OSEM_image = images.get("OSEM_image")
+    allVOIs = None
+    for VOIname, VOI in VOIs.items():
+        prefix = os.path.join(srcdir, VOIname)
+        COM = np.rint(VOI_values[VOIname]["COM"])
+        num_voxels = VOI_values[VOIname]["voxels"]
         print(f"VOI: {VOIname}: COM (in indices): {COM} voxels {num_voxels} = {num_voxels * np.prod(VOI.spacing)} mm^3")
         plt.figure()
         plot_image(VOI, save_name=prefix, vmin=0, vmax=1, transverse_slice=int(COM[0]), coronal_slice=int(COM[1]),
@@ -154,15 +262,13 @@ def VOI_checks(allVOInames, OSEM_image=None, reference_image=None, srcdir='.', *
 
         # construct transparency image
         if VOIname == 'VOI_whole_object':
-            VOI /= 2
+            VOI = VOI / 2
         if allVOIs is None:
             allVOIs = VOI.clone()
         else:
             allVOIs += VOI
-        if OSEM_image is not None:
-            OSEM_VOI_values.append(VOI_mean(OSEM_image, VOI))
-        if reference_image:
-            ref_VOI_values.append(VOI_mean(reference_image, VOI))
+    if allVOIs is None:
+        return
     allVOIs /= allVOIs.max()
 
     if OSEM_image is not None:
@@ -170,15 +276,52 @@ def VOI_checks(allVOInames, OSEM_image=None, reference_image=None, srcdir='.', *
         plot_image(OSEM_image, alpha=allVOIs, save_name=os.path.join(srcdir, "OSEM_image_and_VOIs"), **kwargs)
 
     # unformatted print of VOI values for now
-    print(allVOInames)
-    print(OSEM_VOI_values)
-    print(ref_VOI_values)
+    print(list(VOIs))
+    for name in images:
+        print([VOI_values[VOIname]["means"][name] for VOIname in VOIs])
+
+
+def run_QC(srcdir, slices: dict, skip_sino_profiles=False, report_file='QC_report.json', plots=True) -> dict:
+    """
+    Reads all data in `srcdir` once, writes a `QC_report` (as JSON in `srcdir/report_file`), optionally plots,
+    and then raises a `ValueError` if any array is invalid (see `check_report`).
+    """
+    sinos, images, VOIs = read_arrays(srcdir, sinograms=not skip_sino_profiles)
+    report = QC_report(sinos, images, VOIs)
+    report["srcdir"] = str(srcdir)
+    with open(os.path.join(srcdir, report_file), 'w') as f:
+        json.dump(report, f, indent=2)
+    if plots:
+        if report["profiles"]:
+            plot_profiles(report["profiles"], srcdir=srcdir)
+        for name, image in images.items():
+            plt.figure()
+            plot_image(image, os.path.join(srcdir, 'PETRIC' if name == 'reference_image' else '', name), **slices)
+        OSEM_reference = {name: images[name] for name in ('OSEM_image', 'reference_image') if name in images}
+        plot_VOIs(VOIs, OSEM_reference, srcdir=os.path.join(srcdir, 'PETRIC'), report=report, **slices)
+    check_report(report)
+    return report
+
+
+def QC_all(srcdir, report_file='QC_report.json') -> bool:
+    """`run_QC` without plots. Returns whether all arrays are valid"""
+    try:
+        run_QC(srcdir, {}, report_file=report_file, plots=False)
+    except ValueError as exc:
+        print(exc)
+        return False
+    return True
 
 
 def main(argv=None):
     args = docopt(__doc__, argv=argv, version=__version__)
     dataset = args['--dataset']
     srcdir = args['--srcdir']
+    if args['--all']:
+        for dataset in DATA_SUBSETS:
+            if os.path.isdir(srcdir := the_data_path(dataset)):
+                print(f"{dataset}: {'OK' if QC_all(srcdir, args['--report']) else 'FAILED'}")
+        return
     skip_sino_profiles = args['--skip_sino_profiles']
     slices = {}
     slices["transverse_slice"] = literal_eval(args['--transverse_slice'])
@@ -196,25 +339,9 @@ def main(argv=None):
         if srcdir is None:
             srcdir = os.getcwd()
 
-    if not skip_sino_profiles:
-        acquired_data = STIR.AcquisitionData(os.path.join(srcdir, 'prompts.hs'))
-        additive_term = STIR.AcquisitionData(os.path.join(srcdir, 'additive_term.hs'))
-        mult_factors = STIR.AcquisitionData(os.path.join(srcdir, 'mult_factors.hs'))
-        background = additive_term * mult_factors
-        plot_sinogram_profile(acquired_data, background, srcdir=srcdir)
-        check_values_non_negative(acquired_data.as_array(), "prompts")
-        check_values_non_negative(additive_term.as_array(), "additive_term")
-        check_values_non_negative(mult_factors.as_array(), "mult_factors")
-        check_values_non_negative(background.as_array(), "background")
-
-    OSEM_image = check_and_plot_image_if_exists(os.path.join(srcdir, 'OSEM_image'), **slices)
-    check_and_plot_image_if_exists(os.path.join(srcdir, 'kappa'), **slices)
-    reference_image = check_and_plot_image_if_exists(os.path.join(srcdir, 'PETRIC/reference_image'), **slices)
-
-    VOIdir = os.path.join(srcdir, 'PETRIC')
-    allVOInames = [os.path.basename(str(voi)[:-3]) for voi in Path(VOIdir).glob("VOI_*.hv")]
-    VOI_checks(allVOInames, OSEM_image, reference_image, srcdir=VOIdir, **slices)
-    plt.show()
+    run_QC(srcdir, slices, skip_sino_profiles, args['--report'], plots=not args['--no_plots'])
+    if not args['--no_plots']:
+        plt.show()
 
 
 if __name__ == '__main__':
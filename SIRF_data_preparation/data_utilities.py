@@ -4,14 +4,14 @@
 # Copyright (C) 2021 Commonwealth Scientific and Industrial Research Organisation
 # Copyright (C) 2024 University College London
 # Copyright (C) 2024 STFC, UK Research and Innovation
-import importlib
+import hashlib
+import json
 import logging
 import os
 import shutil
-
-pet = importlib.import_module('sirf.STIR')
-
-pet.AcquisitionData.set_storage_scheme('memory')
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
 
 logger = logging.getLogger("PETRIC")
 # DATA_PATH = '/home/KrisThielemans/devel/PETRIC/data'
@@ -39,19 +39,132 @@ def the_orgdata_path(*folders):
     return os.path.join(ORG_DATA_PATH, *folders)
 
 
+#: `bytes.translate` table converting (Siemens) '\r' line endings to '\n'
+EOL_TABLE = bytes.maketrans(b'\r', b'\n')
+
+
+def normalise_header(in_filename, out_filename, table=EOL_TABLE, delete=b'', chunk_size=1 << 20):
+    '''Copies a (vendor) Interfile header, translating bytes with `table` and removing `delete` bytes
+
+    Streams `chunk_size` bytes at a time (i.e. uses constant memory).
+    The output is replaced atomically, so `out_filename` may be `in_filename`.
+    '''
+    tmp_filename = f'{out_filename}.{os.getpid()}.tmp'
+    with open(in_filename, mode="rb") as fin, open(tmp_filename, mode="wb") as fout:
+        while chunk := fin.read(chunk_size):
+            fout.write(chunk.translate(table, delete))
+    os.replace(tmp_filename, out_filename)
+
+
 def fix_siemens_norm_EOL(in_filename, out_filename):
-    with open(in_filename, mode="rb") as f:
-        data = bytearray(f.read())
-    for i in range(len(data)):
-        if data[i] == 13: # '\r'
-            data[i] = 10  # \n
-    with open(out_filename, mode="wb") as f:
-        f.write(data)
+    normalise_header(in_filename, out_filename)
+
+
+def _import_STIR():
+    '''Returns `sirf.STIR` (using "memory" storage for `AcquisitionData`)
+
+    NB: deferred such that e.g. `the_data_path` & `normalise_header` do not need SIRF.
+    '''
+    import sirf.STIR as pet
+    pet.AcquisitionData.set_storage_scheme('memory')
+    return pet
+
+
+def interfile_digests(*filenames):
+    '''Returns the digests of files (including the data file of Siemens Interfile ".hdr" headers)'''
+    # NB: deferred such that importing this module does not import `petric_tools`
+    from petric_tools.interfile import read_interfile_header
+    from petric_tools.subset_cache import file_digest
+
+    digests = []
+    for filename in filenames:
+        digests.append(file_digest(filename))
+        if filename.endswith('.hdr') and (data_file := read_interfile_header(filename).get('name of data file')):
+            digests.append(file_digest(os.path.join(os.path.dirname(filename), os.path.basename(data_file))))
+    return digests
+
+
+def run_stage(name, stagedir, inputs, outputs, compute, force=False):
+    '''Runs a cached stage of a data preparation pipeline
+
+    name: name of the stage, used for its record `stagedir/name.json`
+    inputs: (JSON-serialisable) dict of everything the outputs depend on (e.g. file digests, parameters, other keys)
+    outputs: dict of output name to (Interfile) file name
+    compute: function returning a dict of output name to `AcquisitionData`
+    force: run even if cached
+
+    Outputs are read from file if they exist and were created with the same `inputs`.
+    Returns (key, outputs), where `key` identifies the outputs, i.e. can be used as input for other stages.
+    '''
+    pet = _import_STIR()
+    key = hashlib.blake2b(json.dumps({'stage': name, **inputs}, sort_keys=True, default=str).encode(),
+                          digest_size=16).hexdigest()
+    record = os.path.join(stagedir, name + '.json')
+    headers = {n: f if f.endswith('.hs') else f + '.hs' for n, f in outputs.items()}
+    if not force and os.path.isfile(record) and all(map(os.path.isfile, headers.values())):
+        with open(record) as f:
+            if json.load(f) == {'key': key, 'outputs': headers}:
+                logger.info(f'{name}: using cached {", ".join(headers.values())}')
+                return key, {n: pet.AcquisitionData(f) for n, f in headers.items()}
+    logger.info(f'{name}: computing...')
+    if os.path.isfile(record):
+        os.remove(record) # outputs are about to be overwritten
+    start = time.time()
+    results = compute()
+    for n, f in headers.items():
+        logger.info(f'{name}: writing {n} to {f}')
+        results[n].write(f)
+    os.makedirs(stagedir, exist_ok=True)
+    with open(record + '.tmp', 'w') as f:
+        json.dump({'key': key, 'outputs': headers}, f, indent=2)
+    os.replace(record + '.tmp', record)
+    logger.info(f'{name}: done in {time.time() - start:.1f} sec')
+    return key, results
+
+
+def histogram_listmode(f_listmode, f_template, output_prefix, start, stop, f_info=None, f_warn=None):
+    '''Returns prompts and (estimated) randoms of list-mode data between `start` and `stop` (in sec)
+
+    f_info, f_warn: if set, redirects the engine's messages to these files during the call (e.g. in a worker process).
+    NB: this replaces any current redirection, and resets it to stdout on return.
+    '''
+    pet = _import_STIR()
+    if f_info is not None:
+        _ = pet.MessageRedirector(f_info, f_warn)
+    logger.info(f"Processing listmode data from {start} to {stop} sec to {output_prefix}")
+    lm2sino = pet.ListmodeToSinograms()
+    lm2sino.set_input(pet.ListmodeData(f_listmode))
+    lm2sino.set_output_prefix(output_prefix)
+    lm2sino.set_template(pet.AcquisitionData(f_template))
+    lm2sino.set_time_interval(start, stop)
+    lm2sino.set_up()
+    lm2sino.process()
+    return {'prompts': lm2sino.get_output(), 'randoms': lm2sino.estimate_randoms()}
+
+
+def _histogram_chunk(chunk, stagedir, inputs, f_listmode, f_template, start, stop, force=False, in_worker=False):
+    '''Cached `histogram_listmode` of a time-frame chunk (for `prepare_challenge_Siemens_data`). Returns its key
+
+    in_worker: redirect the engine's messages to per-chunk files (otherwise, the caller's redirection is kept)
+    '''
+    prefix = os.path.join(stagedir, f'prompts_{chunk}')
+    outputs = {'prompts': prefix, 'randoms': os.path.join(stagedir, f'randoms_{chunk}')}
+
+    def compute():
+        if in_worker:
+            return histogram_listmode(f_listmode, f_template, prefix, start, stop, prefix + '_info.txt',
+                                      prefix + '_warn.txt')
+        return histogram_listmode(f_listmode, f_template, prefix, start, stop)
+
+    key, _ = run_stage(f'histogram_{chunk}', stagedir, {**inputs, 'start': start, 'stop': stop}, outputs, compute,
+                       force)
+    return key
 
 
 def prepare_challenge_Siemens_data(data_path, challenge_data_path, intermediate_data_path, f_root, f_listmode, f_mumap,
                                    f_attn, f_norm, f_stir_norm, f_template, f_prompts, f_multfactors, f_additive,
-                                   f_randoms, f_af, f_acf, f_scatter, start, stop):
+                                   f_randoms, f_af, f_acf, f_scatter, start, stop, chunks=1, jobs=1,
+                                   scatter_iterations=4, scatter_subsets=7, force=False):
     '''Prepares Siemens data for SyneRBI PETRIC
 
     data_path: path to Siemens data
@@ -73,6 +186,17 @@ def prepare_challenge_Siemens_data(data_path, challenge_data_path, intermediate_
     f_scatter: scatter estimate file name
     start: start time for data acquisition
     stop: end time for data acquisition
+    chunks: number of time-frame chunks to histogram separately (and sum)
+    jobs: number of chunks to histogram in parallel (in separate processes)
+    scatter_iterations: number of scatter estimation iterations
+    scatter_subsets: number of OSEM subsets used for scatter estimation
+    force: recompute all stages
+
+    The preparation consists of stages (histogramming, attenuation, scatter, multfactors, additive),
+    whose outputs are reused if their inputs did not change (see `run_stage`, records are in
+    `intermediate_data_path/stages`). For instance, changing scatter parameters does not redo histogramming.
+    NB: with `chunks > 1`, randoms are estimated per chunk and summed, which is only approximately equal
+    to estimating them from all data.
     '''
 
     logging.info(f"Start time for data: {start} sec")
@@ -94,8 +218,11 @@ def prepare_challenge_Siemens_data(data_path, challenge_data_path, intermediate_
     f_scatter = os.path.join(intermediate_data_path, f_scatter)
     f_info = os.path.join(intermediate_data_path, 'info.txt')
     f_warn = os.path.join(intermediate_data_path, 'warn.txt')
+    stagedir = os.path.join(intermediate_data_path, 'stages')
+    os.makedirs(stagedir, exist_ok=True)
 
-    if os.path.exists(f_siemens_attn_image):
+    attenuation = os.path.exists(f_siemens_attn_image)
+    if attenuation:
         if data_path != intermediate_data_path:
             shutil.copy(f_siemens_attn_image, intermediate_data_path)
         os.system('convertSiemensInterfileToSTIR.sh ' + f_siemens_attn_header + ' ' + f_stir_attn_header)
@@ -106,88 +233,107 @@ def prepare_challenge_Siemens_data(data_path, challenge_data_path, intermediate_
         shutil.copy(f_siemens_norm, intermediate_data_path)
     fix_siemens_norm_EOL(f_siemens_norm_header, f_stir_norm_header)
 
-    # engine's messages go to files, except error messages, which go to stdout
-    _ = pet.MessageRedirector(f_info, f_warn)
-
     # select acquisition data storage scheme
-    pet.AcquisitionData.set_storage_scheme('memory')
-
-    # read acquisition data template
-    acq_data_template = pet.AcquisitionData(f_template)
-    logger.info(acq_data_template.norm())
-
-    output_prefix = os.path.join(intermediate_data_path, "prompts")
+    pet = _import_STIR()
 
-    listmode_data = pet.ListmodeData(f_listmode)
-
-    logger.info("Processing listmode data...")
-    logger.info(f"Start time: {start} sec. End time: {stop} sec.")
-    logger.info(f"Output prefix: {output_prefix}")
-    # create listmode-to-sinograms converter object
-    lm2sino = pet.ListmodeToSinograms()
-    lm2sino.set_input(listmode_data)
-    lm2sino.set_output_prefix(output_prefix)
-    lm2sino.set_template(acq_data_template)
-    lm2sino.set_time_interval(start, stop)
-    lm2sino.set_up()
-    lm2sino.process()
+    # engine's messages go to files, except error messages, which go to stdout
+    _ = pet.MessageRedirector(f_info, f_warn)
 
-    prompts = lm2sino.get_output()
-    randoms = lm2sino.estimate_randoms()
+    template = {'template': interfile_digests(f_template)}
+    norm = {'norm': interfile_digests(f_siemens_norm_header)}
+    mumap = {'mumap': interfile_digests(f_siemens_attn_header) if attenuation else None}
+
+    # histogram time-frame chunks (in parallel), and sum them
+    listmode = {'listmode': interfile_digests(f_listmode), **template}
+    times = [start + (stop-start) * i / chunks for i in range(chunks + 1)]
+    args = [(i, stagedir, listmode, f_listmode, f_template, t0, t1, force)
+            for i, (t0, t1) in enumerate(zip(times[:-1], times[1:]))]
+    if jobs > 1 and chunks > 1:
+        with ProcessPoolExecutor(min(jobs, chunks), mp_context=get_context('spawn')) as executor:
+            futures = [executor.submit(_histogram_chunk, *a, in_worker=True) for a in args]
+            for done, _ in enumerate(as_completed(futures), 1):
+                logger.info(f'histogrammed {done}/{chunks} chunks')
+            chunk_keys = [future.result() for future in futures]
+    else:
+        chunk_keys = [_histogram_chunk(*a) for a in args]
+
+    def sum_chunks():
+        prompts = pet.AcquisitionData(os.path.join(stagedir, 'prompts_0.hs'))
+        randoms = pet.AcquisitionData(os.path.join(stagedir, 'randoms_0.hs'))
+        for i in range(1, chunks):
+            prompts += pet.AcquisitionData(os.path.join(stagedir, f'prompts_{i}.hs'))
+            randoms += pet.AcquisitionData(os.path.join(stagedir, f'randoms_{i}.hs'))
+        return {'prompts': prompts, 'randoms': randoms}
+
+    histogram_key, sinos = run_stage('histogram', stagedir, {'chunks': chunk_keys},
+                                     {'prompts': f_prompts, 'randoms': f_randoms}, sum_chunks, force)
+    prompts, randoms = sinos['prompts'], sinos['randoms']
     logger.info('data shape: %s' % repr(prompts.shape))
     logger.info('prompts norm: %f' % prompts.norm())
     logger.info('randoms norm: %f' % randoms.norm())
 
-    logger.info(f'writing prompts to {f_prompts} and randoms to {f_randoms}')
-    prompts.write(f_prompts)
-    randoms.write(f_randoms)
-
     asm = pet.AcquisitionSensitivityModel(f_stir_norm_header)
 
-    if os.path.exists(f_siemens_attn_image):
+    if attenuation:
         attn_image = pet.ImageData(f_stir_attn_header)
-        af, acf = pet.AcquisitionSensitivityModel.compute_attenuation_factors(prompts, attn_image)
+
+        def compute_attenuation():
+            af, acf = pet.AcquisitionSensitivityModel.compute_attenuation_factors(prompts, attn_image)
+            return {'af': af, 'acf': acf}
+
+        # NB: only depends on the geometry of the prompts, i.e. the template
+        attenuation_key, factors = run_stage('attenuation', stagedir, {**template, **mumap}, {'af': f_af, 'acf': f_acf},
+                                             compute_attenuation, force)
+        af, acf = factors['af'], factors['acf']
         logger.info('norm of the attenuation factor: %f' % af.norm())
         logger.info('norm of the attenuation correction factor: %f' % acf.norm())
-        logger.info(f'writing intermediate attenuation factors to {f_af}')
-        logger.info(f'writing intermediate attenuation coefficient factors to {f_acf}')
-        af.write(f_af)
-        acf.write(f_acf)
-
-        se = pet.ScatterEstimator()
-        se.set_input(prompts)
-        se.set_attenuation_image(attn_image)
-        se.set_randoms(randoms)
-        se.set_asm(asm)
-        se.set_attenuation_correction_factors(acf)
-        se.set_num_iterations(4)
-        se.set_OSEM_num_subsets(7)
-        se.set_output_prefix(f_scatter)
-        se.set_up()
-        se.process()
-        scatter = se.get_output()
+
+        def compute_scatter():
+            se = pet.ScatterEstimator()
+            se.set_input(prompts)
+            se.set_attenuation_image(attn_image)
+            se.set_randoms(randoms)
+            se.set_asm(asm)
+            se.set_attenuation_correction_factors(acf)
+            se.set_num_iterations(scatter_iterations)
+            se.set_OSEM_num_subsets(scatter_subsets)
+            se.set_output_prefix(f_scatter)
+            se.set_up()
+            se.process()
+            return {'scatter': se.get_output()}
+
+        scatter_inputs = {
+            'histogram': histogram_key, 'attenuation': attenuation_key, **norm,
+            **mumap, 'num_iterations': scatter_iterations, 'num_subsets': scatter_subsets}
+        scatter_key, scatter = run_stage('scatter', stagedir, scatter_inputs, {'scatter': f_scatter}, compute_scatter,
+                                         force)
+        scatter = scatter['scatter']
         logger.info('norm of the scatter estimate: %f' % scatter.norm())
-        background = randoms + scatter
     else:
+        attenuation_key = scatter_key = None
         af = prompts.allocate(1)
         logger.info('No attenuation image: skipping attenuation and scatter')
-        background = randoms
 
-    multfact = af.clone()
-    asm.set_up(af)
-    asm.unnormalise(multfact)
-    logger.info(multfact.norm())
-    logger.info(f'writing multiplicative factors to {f_multfactors}')
-    multfact.write(f_multfactors)
+    def compute_multfactors():
+        multfact = af.clone()
+        asm.set_up(af)
+        asm.unnormalise(multfact)
+        return {'multfactors': multfact}
 
-    logger.info('norm of the background term: %f' % background.norm())
-
-    asm_mf = pet.AcquisitionSensitivityModel(multfact)
-    asm_mf.set_up(background)
-    asm_mf.normalise(background)
-    logger.info('norm of the additive term: %f' % background.norm())
-    logger.info(f'writing additive term to {f_additive}')
-
-    background.write(f_additive)
+    multfactors_key, multfact = run_stage('multfactors', stagedir, {**template, 'attenuation': attenuation_key, **norm},
+                                          {'multfactors': f_multfactors}, compute_multfactors, force)
+    multfact = multfact['multfactors']
+    logger.info(multfact.norm())
 
-    return
+    def compute_additive():
+        background = randoms if scatter_key is None else randoms + scatter
+        logger.info('norm of the background term: %f' % background.norm())
+        asm_mf = pet.AcquisitionSensitivityModel(multfact)
+        asm_mf.set_up(background)
+        asm_mf.normalise(background)
+        return {'additive': background}
+
+    _, additive = run_stage('additive', stagedir,
+                            {'histogram': histogram_key, 'scatter': scatter_key, 'multfactors': multfactors_key},
+                            {'additive': f_additive}, compute_additive, force)
+    logger.info('norm of the additive term: %f' % additive['additive'].norm())
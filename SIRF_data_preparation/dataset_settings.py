@@ -1,7 +1,8 @@
 """Settings for recon and display used in the data preparation"""
 from dataclasses import dataclass
 
-from petric import DATA_SLICES
+from petric import DATA_SLICES, get_num_subsets
+from SIRF_data_preparation.data_utilities import the_data_path
 
 DATA_SUBSETS = {
     'Siemens_mMR_NEMA_IQ': 7, 'Siemens_mMR_NEMA_IQ_lowcounts': 7, 'Siemens_mMR_ACR': 7, 'NeuroLF_Hoffman_Dataset': 16,
@@ -17,4 +18,9 @@ class DatasetSettings:
 
 
 def get_settings(scanID: str):
-    return DatasetSettings(DATA_SUBSETS[scanID], DATA_SLICES[scanID])
+    """NB: for datasets not in `DATA_SUBSETS`/`DATA_SLICES`, uses `get_num_subsets` and default slices"""
+    if scanID in DATA_SUBSETS:
+        num_subsets = DATA_SUBSETS[scanID]
+    else:
+        num_subsets = get_num_subsets(the_data_path(scanID))
+    return DatasetSettings(num_subsets, DATA_SLICES.get(scanID, {}))
@@ -1,13 +1,18 @@
 """Some utilities for plotting objectives and metrics."""
 import csv
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
 
 import matplotlib.pyplot as plt
 import numpy as np
 
-import sirf.STIR as STIR
 from petric import QualityMetrics
+from petric_tools.interfile import read_interfile_memmap
+from petric_tools.iterate_store import IterateStore
+
+log = logging.getLogger('evaluation_utilities')
 
 
 def read_objectives(datadir='.'):
@@ -18,10 +23,74 @@ def read_objectives(datadir='.'):
         return np.asarray([tuple(map(float, row)) for row in reader])
 
 
-def get_metrics(qm: QualityMetrics, iters: Iterable[int], srcdir='.'):
-    """Read 'iter_{iter_glob}.hv' images from datadir, compute metrics and return as 2d array"""
-    return np.asarray([
-        list(qm.evaluate(STIR.ImageData(str(Path(srcdir) / f'iter_{i:04d}.hv'))).values()) for i in iters])
+def iter_metrics(qm: QualityMetrics, iters: Iterable[int], srcdir='.', store: str | None = 'iters.dat',
+                 cache_file: str | None = 'metrics.csv', max_workers: int = 4) -> Iterator[tuple[int, list[float]]]:
+    """
+    Yields `(iteration, metrics)` for 'iter_{iteration:04d}.hv' images in `srcdir`
+    (or in the `IterateStore` `srcdir / store` if it exists).
+    Images are read & evaluated in a pool of `max_workers` threads.
+    Results are cached in `srcdir / cache_file`, keyed by iteration, image file checksum or modification time,
+    and `qm.digest()`, such that only new (or modified) images are evaluated on subsequent calls.
+    """
+    srcdir = Path(srcdir)
+    iterate_store = None
+    if store is not None and (srcdir / store).is_file():
+        iterate_store = IterateStore(srcdir / store)
+
+    def stamps(iters: list[int]) -> list[str]:
+        if iterate_store is not None:
+            checksums = iterate_store.checksums()
+            return [f"crc:{checksums[i]}" for i in iters]
+        return [f"mtime:{(srcdir / f'iter_{i:04d}.v').stat().st_mtime_ns}" for i in iters]
+
+    def evaluate(i: int) -> list[float]:
+        if iterate_store is not None:
+            arr = iterate_store[i]
+        else:
+            # NB: avoid `STIR.ImageData` for thread-safety
+            arr = np.asarray(read_interfile_memmap(srcdir / f'iter_{i:04d}.hv'))
+        return list(qm.evaluate(arr).values())
+
+    iters = list(iters)
+    if cache_file is None:
+        with ThreadPoolExecutor(max_workers) as executor:
+            yield from zip(iters, executor.map(evaluate, iters))
+        return
+    # read cache
+    keys, reference = qm.keys(), qm.digest()
+    cached: dict[tuple[int, str], list[float]] = {}
+    if (cache_path := srcdir / cache_file).is_file():
+        with cache_path.open() as fd:
+            reader = csv.reader(fd)
+            if next(reader, None) == ["iter", "stamp", "reference"] + keys:
+                cached = {(int(row[0]), row[1]): list(map(float, row[3:])) for row in reader if row[2] == reference}
+    iter_stamps = stamps(iters)
+    # (re)write cache (dropping entries for other references), then append new results as they are computed
+    (tmp := cache_path.with_suffix(".tmp")).parent.mkdir(parents=True, exist_ok=True)
+    with tmp.open("w", newline="") as fd:
+        writer = csv.writer(fd)
+        writer.writerow(["iter", "stamp", "reference"] + keys)
+        writer.writerows([i, s, reference] + m for (i, s), m in cached.items())
+    tmp.replace(cache_path)
+    pending = [i for i, s in zip(iters, iter_stamps) if (i, s) not in cached]
+    log.info("evaluating %d of %d images in %s", len(pending), len(iters), srcdir)
+    with ThreadPoolExecutor(max_workers) as executor, cache_path.open("a", buffering=1, newline="") as fd:
+        writer = csv.writer(fd)
+        results = zip(pending, executor.map(evaluate, pending))
+        for i, s in zip(iters, iter_stamps):
+            if (m := cached.get((i, s))) is None:
+                j, m = next(results)
+                assert i == j
+                writer.writerow([i, s, reference] + m)
+            yield i, m
+
+
+def get_metrics(qm: QualityMetrics, iters: Iterable[int], srcdir='.', **kwargs):
+    """
+    Read 'iter_{iter_glob}.hv' images from datadir, compute metrics and return as 2d array.
+    See `iter_metrics` for `kwargs`.
+    """
+    return np.asarray([m for _, m in iter_metrics(qm, iters, srcdir=srcdir, **kwargs)])
 
 
 def plot_metrics(iters: Iterable[int], m: np.ndarray, labels=None, suffix=""):
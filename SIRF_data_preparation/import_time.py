@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""Benchmark the time & side effects of importing a module (default: `petric`)
+
+Imports the module in fresh processes (in an empty working directory, with `PETRIC_CACHE` pointing into it),
+reporting the fastest wall time, the slowest imports (from `python -X importtime`) and any files created.
+Exits with status 1 if the import is slower than the target or has side effects.
+
+Usage:
+  import_time.py [--help | options]
+
+Options:
+  -m <module>, --module=<module>  module to import [default: petric]
+  -r <n>, --repeats=<n>           number of imports to time [default: 5]
+  -t <s>, --target=<s>            maximum import time [default: 1]
+  --top=<n>                       number of slowest imports to list [default: 10]
+"""
+# Copyright 2024 University College London
+# Licence: Apache-2.0
+__version__ = '0.1.0'
+
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from docopt import docopt
+
+log = logging.getLogger('import_time')
+#: directory containing `petric.py`
+REPO = Path(__file__).resolve().parents[1]
+
+
+def run_import(module: str, cwd: Path, importtime: bool = False) -> tuple[float, str]:
+    """Imports `module` in a fresh process in `cwd`. Returns wall time (excluding interpreter start-up) & stderr"""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, (str(REPO), os.getenv("PYTHONPATH"))))}
+    env["PETRIC_CACHE"] = str(cwd / "cache")
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    res = subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    return float(res.stdout.split()[-1]), res.stderr
+
+
+def slowest_imports(importtime: str, top: int = 10, depth: int = 1) -> list[tuple[float, str]]:
+    """
+    (cumulative seconds, module) of the `top` slowest imports in `python -X importtime` output,
+    considering only imports nested at most `depth` levels (i.e. by default the module itself & its direct imports).
+    """
+    res = []
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        # NB: nested imports are indented by 2 spaces per level
+        if (len(name) - len(name.lstrip()) - 1) // 2 <= depth:
+            res.append((int(cumulative) * 1e-6, name.strip()))
+    return sorted(res, reverse=True)[:top]
+
+
+def created_files(path: Path) -> list[Path]:
+    return sorted(p.relative_to(path) for p in path.rglob("*"))
+
+
+def main(argv=None):
+    args = docopt(__doc__, argv=argv, version=__version__)
+    logging.basicConfig(level=logging.INFO)
+    module, target = args['--module'], float(args['--target'])
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cwd = Path(tmpdir)
+        _, importtime = run_import(module, cwd, importtime=True) # NB: also warms up the file system cache
+        times = [run_import(module, cwd)[0] for _ in range(int(args['--repeats']))]
+        side_effects = created_files(cwd)
+
+    print(f"import {module}: {min(times):.3f}s (median {sorted(times)[len(times) // 2]:.3f}s, target {target:g}s)")
+    for seconds, name in slowest_imports(importtime, int(args['--top'])):
+        print(f"  {seconds:8.3f}s  {name}")
+    failed = False
+    if min(times) > target:
+        log.error("import of %s slower than target (%.3fs > %gs)", module, min(times), target)
+        failed = True
+    if side_effects:
+        log.error("import of %s created files: %s", module, ", ".join(map(str, side_effects)))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,7 +15,14 @@ Options:
   --num_subsets=<n>           number of subsets. If not specified, will use dataset_settings.get_settings.
   --initial_step_size=<s>     start stepsize [default: .3]
   --relaxation_eta=<r>        relaxation factor per epoch [default: .01]
+  --final_fraction=<f>        optionally adapt relaxation_eta such that the step size decays to this fraction of
+                              initial_step_size after --updates (see petric_tools.relaxation.TimeBudgetRelaxation)
   --interval=<i>              interval to save [default: 80]
+  --save_queue_size=<q>       number of iterates to buffer for saving in the background (0: no buffering) [default: 0]
+  --store=<filename>          optional single-file store for iterates (e.g. iters.dat) instead of Interfile images
+  --checkpoint_interval=<c>   interval to save a checkpoint of the algorithm state (0: never) [default: 0]
+  --resume                    resume from the last checkpoint in the output directory (if any),
+                              continuing iteration numbers, objectives.csv and TensorBoard logs
   --outreldir=<relpath>       optional relative path to override
                               (defaults to 'BSREM' or 'BSREM_cont' if initial_image is set)
 """
@@ -31,11 +38,17 @@ from docopt import docopt
 
 import sirf.STIR as STIR
 from petric import OUTDIR, SRCDIR, MetricsWithTimeout, get_data
+from petric_tools.relaxation import StepSizeRuleMixin, TimeBudgetRelaxation
 from sirf.contrib.BSREM.BSREM import BSREM1
 from sirf.contrib.partitioner import partitioner
 from SIRF_data_preparation import data_QC
 from SIRF_data_preparation.dataset_settings import get_settings
 
+
+class BSREM(StepSizeRuleMixin, BSREM1):
+    """`BSREM1` with an optional `step_size_rule` (e.g. `TimeBudgetRelaxation`, see `--final_fraction`)"""
+
+
 # %%
 args = docopt(__doc__, argv=None, version=__version__)
 # logging.basicConfig(level=logging.INFO)
@@ -46,7 +59,12 @@ initial_image = args['--initial_image']
 num_subsets = args['--num_subsets']
 initial_step_size = float(args['--initial_step_size'])
 relaxation_eta = float(args['--relaxation_eta'])
+final_fraction = args['--final_fraction']
 interval = int(args['--interval'])
+save_queue_size = int(args['--save_queue_size'])
+store = args['--store']
+checkpoint_interval = int(args['--checkpoint_interval'])
+resume = args['--resume']
 outreldir = args['--outreldir']
 
 if not all((SRCDIR.is_dir(), OUTDIR.is_dir())):
@@ -77,7 +95,7 @@ print("num_updates:", num_updates)
 print("initial_image:", initial_image_name)
 print("outdir:", outdir)
 print("initial_step_size:", initial_step_size)
-print("relaxation_eta:", relaxation_eta)
+print("relaxation_eta:", relaxation_eta if final_fraction is None else f"adaptive (final_fraction {final_fraction})")
 print("interval:", interval)
 
 data_sub, acq_models, obj_funs = partitioner.data_partition(data.acquired_data, data.additive_term, data.mult_factors,
@@ -89,11 +107,20 @@ data.prior.set_up(data.OSEM_image)
 for f in obj_funs: # add prior evenly to every objective function
     f.set_prior(data.prior)
 
-algo = BSREM1(data_sub, obj_funs, initial=initial_image, initial_step_size=initial_step_size,
-              relaxation_eta=relaxation_eta, update_objective_interval=interval)
+algo = BSREM(data_sub, obj_funs, initial=initial_image, initial_step_size=initial_step_size,
+             relaxation_eta=relaxation_eta, update_objective_interval=interval)
 # %%
-algo.run(num_updates,
-         callbacks=[MetricsWithTimeout(**settings.slices, interval=interval, outdir=outdir, seconds=3600 * 100)])
+metrics = MetricsWithTimeout(**settings.slices, interval=interval, outdir=outdir, seconds=3600 * 100,
+                             save_queue_size=save_queue_size, save_store=store, checkpoint_interval=checkpoint_interval,
+                             resume=resume)
+if final_fraction is not None:
+    algo.step_size_rule = TimeBudgetRelaxation(initial_step_size, relaxation_eta, float(final_fraction),
+                                               timeout=metrics, max_iteration=num_updates)
+if resume and metrics.restore(algo):
+    print("resuming from iteration:", algo.iteration)
+metrics.attach(algo)
+algo.run(num_updates - max(algo.iteration, 0), callbacks=[metrics])
+metrics.close()
 # %%
 fig = plt.figure()
 data_QC.plot_image(algo.get_output(), **settings.slices)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""Find a number of subsets for a dataset by timing projections
+
+Times forward & back-projections of a subset for each candidate number of subsets, and picks the one maximising
+subset updates per second, subject to a minimum number of views & counts per subset (see `score`).
+NB: this is a heuristic, not a model of convergence.
+
+Usage:
+  tune_num_subsets.py <data_path> [--help | options]
+
+Arguments:
+  <data_path>  path to data files
+
+Options:
+  -c <list>, --candidates=<list>  comma-separated numbers of subsets to try [default: 1,2,4,5,7,8,10,12,14,16,20,24,32]
+  -r <n>, --repeats=<n>           number of projection pairs to time per candidate [default: 3]
+  --min_views=<v>                 minimum number of views per subset [default: 16]
+  --min_counts=<c>                minimum number of prompts per subset [default: 1e6]
+  -w, --write_num_subsets         write in <data_path>/num_subsets.txt
+"""
+# Copyright 2024 University College London
+# Licence: Apache-2.0
+__version__ = '0.1.0'
+
+import logging
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+from docopt import docopt
+
+import sirf.STIR as STIR
+from petric import Dataset, get_data
+from sirf.contrib.partitioner.partitioner import partition_indices
+
+log = logging.getLogger('tune_num_subsets')
+
+
+def time_subset_projections(data: Dataset, num_subsets: int, repeats: int = 3) -> float:
+    """Returns the (minimum) time of a forward & back-projection of the first of `num_subsets` subsets"""
+    views = data.mult_factors.dimensions()[2]
+    idxs = partition_indices(num_subsets, list(range(views)), stagger=True)[0]
+    acq_model = STIR.AcquisitionModelUsingParallelproj()
+    acq_model.set_additive_term(data.additive_term.get_subset(idxs))
+    acq_model.set_acquisition_sensitivity(STIR.AcquisitionSensitivityModel(data.mult_factors.get_subset(idxs)))
+    prompts = data.acquired_data.get_subset(idxs)
+    acq_model.set_up(prompts, data.OSEM_image)
+    denom = prompts.get_uniform_copy(0)
+    backprojection = data.OSEM_image.get_uniform_copy(0)
+    acq_model.forward(data.OSEM_image, out=denom) # warm-up
+    times = []
+    for _ in range(repeats):
+        start = perf_counter()
+        acq_model.forward(data.OSEM_image, out=denom)
+        acq_model.backward(denom, out=backprojection)
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def score(num_subsets: int, subset_time: float, views: int, counts: float, min_views: int = 16,
+          min_counts: float = 1e6) -> float:
+    """
+    Heuristic score: subset updates per second (`1 / subset_time`), penalised when subsets have fewer than
+    `min_views` views or `min_counts` counts.
+    Assumes that each subset update progresses as much as a full iteration as long as subsets are large enough
+    (i.e. the usual ordered subsets acceleration), so picks the largest number of subsets satisfying `min_views` &
+    `min_counts`, unless per-subset overheads dominate `subset_time`.
+    NB: does not model convergence (e.g. slower final convergence or limit cycles with many subsets),
+    so `min_views` & `min_counts` need to be set accordingly.
+    """
+    quality = min(1, views / num_subsets / min_views) * min(1, counts / num_subsets / min_counts)
+    return quality / subset_time
+
+
+def tune_num_subsets(data: Dataset, candidates=(1, 2, 4, 5, 7, 8, 10, 12, 14, 16, 20, 24, 32), repeats: int = 3,
+                     **kwargs) -> tuple[int, dict[int, float]]:
+    """Returns the best of `candidates` & all scores. `kwargs` are passed to `score`"""
+    views = data.mult_factors.dimensions()[2]
+    counts = data.acquired_data.sum()
+    scores = {}
+    for num_subsets in candidates:
+        if num_subsets > views:
+            continue
+        subset_time = time_subset_projections(data, num_subsets, repeats)
+        scores[num_subsets] = score(num_subsets, subset_time, views, counts, **kwargs)
+        log.info("%d subsets: %.3fs per subset, %.3fs per epoch, score %.3g", num_subsets, subset_time,
+                 num_subsets * subset_time, scores[num_subsets])
+    return max(scores, key=scores.__getitem__), scores
+
+
+def main(argv=None):
+    args = docopt(__doc__, argv=argv, version=__version__)
+    logging.basicConfig(level=logging.INFO)
+
+    data_path = Path(args['<data_path>'])
+    data = get_data(srcdir=data_path, outdir=None)
+    num_subsets, _ = tune_num_subsets(data, [int(n) for n in args['--candidates'].split(',')], int(args['--repeats']),
+                                      min_views=int(args['--min_views']), min_counts=float(args['--min_counts']))
+    print("num_subsets:", num_subsets)
+    if args['--write_num_subsets']:
+        np.savetxt(data_path / 'num_subsets.txt', [num_subsets], fmt='%d')
+
+
+if __name__ == '__main__':
+    main()
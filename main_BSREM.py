@@ -8,8 +8,9 @@ Once renamed or symlinked as `main.py`, it will be used by `petric.py` as follow
 >>> algorithm.run(np.inf, callbacks=metrics + submission_callbacks)
 """
 from cil.optimisation.algorithms import Algorithm
-from cil.optimisation.utilities import callbacks
-from petric import Dataset
+from cil.optimisation.utilities import StepSizeRule, callbacks
+from petric import Dataset, MetricsWithTimeout, get_num_subsets
+from petric_tools.relaxation import StepSizeRuleMixin, TimeBudgetRelaxation
 from sirf.contrib.BSREM.BSREM import BSREM1
 from sirf.contrib.partitioner import partitioner
 
@@ -30,14 +31,20 @@ class MaxIteration(callbacks.Callback):
             raise StopIteration
 
 
-class Submission(BSREM1):
+class Submission(StepSizeRuleMixin, BSREM1):
     # note that `issubclass(BSREM1, Algorithm) == True`
-    def __init__(self, data: Dataset, num_subsets: int = 7, update_objective_interval: int = 10):
+    def __init__(self, data: Dataset, num_subsets: int | None = None, update_objective_interval: int = 10,
+                 step_size_rule: StepSizeRule | None = None):
         """
         Initialisation function, setting up data & (hyper)parameters.
-        NB: in practice, `num_subsets` should likely be determined from the data.
+        num_subsets: defaults to `get_num_subsets` (i.e. `num_subsets.txt` next to the data, if any).
+        step_size_rule: e.g. `TimeBudgetRelaxation()` to decay the step size within the time budget
+          (default: `BSREM1`'s, i.e. `relaxation_eta=.01` per epoch).
         This is just an example. Try to modify and improve it!
         """
+        self.step_size_rule = step_size_rule
+        if num_subsets is None:
+            num_subsets = get_num_subsets(data.path)
         data_sub, acq_models, obj_funs = partitioner.data_partition(data.acquired_data, data.additive_term,
                                                                     data.mult_factors, num_subsets,
                                                                     initial_image=data.OSEM_image)
@@ -50,5 +57,15 @@ class Submission(BSREM1):
         super().__init__(data_sub, obj_funs, initial=data.OSEM_image, initial_step_size=.3, relaxation_eta=.01,
                          update_objective_interval=update_objective_interval)
 
+    def run(self, iterations=None, callbacks=None, **kwargs):
+        # NB: budget the step size by the (organisers') timeout & by `submission_callbacks` (e.g. `MaxIteration`)
+        if isinstance(rule := self.step_size_rule, TimeBudgetRelaxation):
+            if rule.timeout is None:
+                rule.timeout = next((c for c in callbacks or () if isinstance(c, MetricsWithTimeout)), None)
+            if rule.max_iteration is None:
+                rule.max_iteration = min((c.max_iteration for c in callbacks or () if isinstance(c, MaxIteration)),
+                                         default=None)
+        return super().run(iterations, callbacks=callbacks, **kwargs)
+
 
 submission_callbacks = [MaxIteration(660)]
@@ -10,7 +10,7 @@ Once renamed or symlinked as `main.py`, it will be used by `petric.py` as follow
 from cil.optimisation.algorithms import ISTA, Algorithm
 from cil.optimisation.functions import IndicatorBox, SGFunction
 from cil.optimisation.utilities import ConstantStepSize, Preconditioner, Sampler, callbacks
-from petric import Dataset
+from petric import Dataset, get_num_subsets
 from sirf.contrib.partitioner import partitioner
 
 assert issubclass(ISTA, Algorithm)
@@ -48,13 +48,15 @@ class Submission(ISTA):
     """Stochastic subset version of preconditioned ISTA"""
 
     # note that `issubclass(ISTA, Algorithm) == True`
-    def __init__(self, data: Dataset, num_subsets: int = 7, step_size: float = 0.1,
+    def __init__(self, data: Dataset, num_subsets: int | None = None, step_size: float = 0.1,
                  update_objective_interval: int = 10):
         """
         Initialisation function, setting up data & (hyper)parameters.
-        NB: in practice, `num_subsets` should likely be determined from the data.
+        num_subsets: defaults to `get_num_subsets` (i.e. `num_subsets.txt` next to the data, if any).
         This is just an example. Try to modify and improve it!
         """
+        if num_subsets is None:
+            num_subsets = get_num_subsets(data.path)
         data_sub, acq_models, obj_funs = partitioner.data_partition(data.acquired_data, data.additive_term,
                                                                     data.mult_factors, num_subsets, mode='staggered',
                                                                     initial_image=data.OSEM_image)
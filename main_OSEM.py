@@ -7,10 +7,14 @@ Once renamed or symlinked as `main.py`, it will be used by `petric.py` as follow
 >>> algorithm = Submission(data)
 >>> algorithm.run(np.inf, callbacks=metrics + submission_callbacks)
 """
+from functools import partial
+
 import sirf.STIR as STIR
 from cil.optimisation.algorithms import Algorithm
 from cil.optimisation.utilities import callbacks
-from petric import Dataset
+from petric import Dataset, get_num_subsets
+from petric_tools import CACHEDIR
+from petric_tools.subset_cache import SubsetCache
 from sirf.contrib.partitioner.partitioner import partition_indices
 
 
@@ -38,22 +42,40 @@ class Submission(Algorithm):
     NB: this example does not use the `sirf.STIR` Poisson objective function.
     NB: see https://github.com/SyneRBI/SIRF-Contribs/tree/master/src/Python/sirf/contrib/BSREM
     """
-    def __init__(self, data: Dataset, num_subsets: int = 7, update_objective_interval: int = 10, **kwargs):
+    def __init__(self, data: Dataset, num_subsets: int | None = None, update_objective_interval: int = 10,
+                 cache: bool = False, objective: str | None = None, **kwargs):
         """
         Initialisation function, setting up data & (hyper)parameters.
-        NB: in practice, `num_subsets` should likely be determined from the data.
+        num_subsets: defaults to `get_num_subsets` (i.e. `num_subsets.txt` next to the data, if any).
         This is just an example. Try to modify and improve it!
+        cache: reuse subset indices & sensitivities from previous runs (see `petric_tools.subset_cache.SubsetCache`).
+          NB: writes to `$PETRIC_CACHE` (default `~/.cache/petric`), and the first run hashes the data files
+          inside `Submission(data)` (i.e. inside the timed part of PETRIC).
+        objective: "cached", "exact" or None (see `update_objective`)
         """
+        if num_subsets is None:
+            num_subsets = get_num_subsets(data.path)
+        assert objective in ("cached", "exact", None)
+        self.objective = objective
         self.acquisition_models = []
         self.prompts = []
-        self.sensitivities = []
+        self.inv_sensitivities = []
+        # work buffers (per subset, i.e. one copy of the sinogram) for forward projections & (in-place) quotients
+        self.denominators = []
+        # (latest) log-likelihood contributions `prompts.dot(log(acq_model.forward(x)))` per subset
+        self.log_likelihoods = [None] * num_subsets
+        # work buffers (per subset) for `log(acq_model.forward(x))` (only for objective="cached")
+        self.log_denominators = []
         self.subset = 0
         self.x = data.OSEM_image.clone()
+        subset_cache = SubsetCache(data, num_subsets, "staggered", cachedir=CACHEDIR if cache else None,
+                                   acq_model="AcquisitionModelUsingParallelproj")
 
         # find views in each subset
         # (note that SIRF can currently only do subsets over views)
         views = data.mult_factors.dimensions()[2]
-        partitions_idxs = partition_indices(num_subsets, list(range(views)), stagger=True)
+        partitions_idxs = subset_cache.indices(
+            "partitions", partial(partition_indices, num_subsets, list(range(views)), stagger=True))
 
         # for each subset: find data, create acq_model, and create subset_sensitivity (backproj of 1)
         for i in range(num_subsets):
@@ -65,35 +87,87 @@ class Submission(Algorithm):
             acquisition_model_subset.set_additive_term(additive_term_subset)
             acquisition_model_subset.set_up(prompts_subset, self.x)
 
-            subset_sensitivity = acquisition_model_subset.backward(multiplicative_factors_subset)
+            subset_sensitivity = subset_cache.image(
+                f"sensitivity_{i}", partial(acquisition_model_subset.backward, multiplicative_factors_subset))
             # add a small number to avoid NaN in division
             subset_sensitivity += subset_sensitivity.max() * 1e-6
 
             self.acquisition_models.append(acquisition_model_subset)
             self.prompts.append(prompts_subset)
-            self.sensitivities.append(subset_sensitivity)
+            # store reciprocal to replace division by multiplication in `update`
+            self.inv_sensitivities.append(subset_sensitivity.power(-1))
+            self.sensitivity = subset_sensitivity if i == 0 else self.sensitivity + subset_sensitivity
+            self.denominators.append(prompts_subset.get_uniform_copy(0))
+            if objective == "cached":
+                self.log_denominators.append(prompts_subset.get_uniform_copy(0))
+        self.backprojection = self.x.get_uniform_copy(0)
 
         super().__init__(update_objective_interval=update_objective_interval, **kwargs)
         self.configured = True # required by Algorithm
 
+    #: added to the denominator to avoid NaN in division
+    EPSILON = .0001
+
     def update(self):
+        """
+        NB: all arithmetic uses `out=` on preallocated buffers (`denominators`, `log_denominators`, `backprojection`)
+        so no image- or sinogram-sized temporaries are created here (the `sirf.STIR` projectors may still allocate
+        internally).
+        """
+        acq_model = self.acquisition_models[self.subset]
+        denom = self.denominators[self.subset]
         # compute forward projection for the denomintor
         # add a small number to avoid NaN in division, as OSEM lead to 0/0 or worse.
         # (Theoretically, MLEM cannot, but it might nevertheless due to numerical issues)
-        denom = self.acquisition_models[self.subset].forward(self.x) + .0001
-        # divide measured data by estimate (ignoring mult_factors!)
-        quotient = self.prompts[self.subset] / denom
+        # NB: this makes prompt-zero bins give `quotient == 0` exactly.
+        acq_model.forward(self.x, out=denom)
+        denom.add(self.EPSILON, out=denom)
+        # reuse forward projection for the objective (if it will be needed by the next `update_objective`)
+        if self.objective == "cached" and -(self.iteration + 1) % self.update_objective_interval < len(self.prompts):
+            log_denom = self.log_denominators[self.subset]
+            denom.log(out=log_denom)
+            self.log_likelihoods[self.subset] = self.prompts[self.subset].dot(log_denom)
+        # divide measured data by estimate (ignoring mult_factors!), in-place
+        quotient = denom
+        self.prompts[self.subset].divide(denom, out=quotient)
 
         # update image with quotient of the backprojection (without mult_factors!) and the sensitivity
-        self.x *= self.acquisition_models[self.subset].backward(quotient) / self.sensitivities[self.subset]
+        acq_model.backward(quotient, out=self.backprojection)
+        self.backprojection.multiply(self.inv_sensitivities[self.subset], out=self.backprojection)
+        self.x.multiply(self.backprojection, out=self.x)
         self.subset = (self.subset + 1) % len(self.prompts)
 
+    def log_likelihood(self, subset: int) -> float:
+        """Returns `prompts.dot(log(acq_model.forward(x)))` for `subset` (NB: overwrites its work buffer)"""
+        denom = self.denominators[subset]
+        self.acquisition_models[subset].forward(self.x, out=denom)
+        denom.add(self.EPSILON, out=denom)
+        denom.log(out=denom)
+        return self.prompts[subset].dot(denom)
+
     def update_objective(self):
         """
-        NB: The objective value is not required by OSEM nor by PETRIC, so this returns `0`.
-        NB: It should be `sum(prompts * log(acq_model.forward(self.x)) - self.x * sensitivity)` across all subsets.
+        Poisson log-likelihood (up to a constant) `sum(prompts * log(acq_model.forward(x))) - x.dot(sensitivity)`
+        NB: The objective value is not required by OSEM nor by PETRIC.
+        objective=None (default): `0`.
+        objective="cached": uses each subset's contribution from its last `update` (i.e. from the previous
+          `num_subsets` iterates), so costs no extra projections (but an extra sinogram-sized buffer per subset
+          and a `log` in the `num_subsets` updates before each `update_objective_interval`).
+          Gives `nan` until all subsets have a contribution (e.g. at iteration 0, or if `update_objective_interval`
+          is less than `num_subsets`).
+        objective="exact": recomputes all forward projections.
+        NB: appends the value to `loss` (as required by `Algorithm`, e.g. for `get_last_loss`)
         """
-        return 0
+        if self.objective is None:
+            value = 0.
+        else:
+            if self.objective == "exact":
+                self.log_likelihoods = [self.log_likelihood(i) for i in range(len(self.prompts))]
+            if None in self.log_likelihoods:
+                value = float("nan")
+            else:
+                value = sum(self.log_likelihoods) - self.x.dot(self.sensitivity)
+        self.loss.append(value)
 
 
 submission_callbacks = [MaxIteration(660)]
@@ -13,26 +13,49 @@ Usage:
 
 Options:
   --log LEVEL  : Set logging level (DEBUG, [default: INFO], WARNING, ERROR, CRITICAL)
+  --jobs N     : Number of datasets to run in parallel (in separate processes) [default: 1]
+  --threads T  : Number of threads per job (default: number of CPUs / N, or unchanged if N is 1).
+                 NB: if N is 1, only for libraries not yet initialised by petric.py itself
+  --profile K  : Log per-phase timings (profile.csv & TensorBoard),
+                 keeping sampled call stacks of the K slowest iterations
 """
+from __future__ import annotations
+
+import atexit
 import csv
+import hashlib
 import logging
 import os
 import re
-from dataclasses import dataclass
+import sys
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from functools import cached_property
+from importlib import import_module
 from pathlib import Path, PurePath
+from queue import Queue
+from threading import Thread
 from time import time
-from typing import Iterable
+from traceback import print_exc
+from typing import TYPE_CHECKING, Any, Callable, Iterable
 
 import numpy as np
-from scipy.ndimage import binary_erosion
-from skimage.metrics import mean_squared_error as mse
-from tensorboardX import SummaryWriter
-from tqdm.auto import tqdm
 
-import sirf.STIR as STIR
 from cil.optimisation.algorithms import Algorithm
 from cil.optimisation.utilities import callbacks as cil_callbacks
 from img_quality_cil_stir import ImageQualityCallback
+from petric_tools import lazy_import
+from petric_tools.checkpoint import Checkpoint
+from petric_tools.interfile import interfile_dtype, read_interfile_header, read_interfile_memmap
+from petric_tools.iterate_store import IterateStore
+from petric_tools.metrics import PassDetector, RegionMetrics
+from petric_tools.profiler import Profiler, peak_rss
+
+if TYPE_CHECKING:
+    from petric_tools.warm_start import WarmStartBank
+
+STIR = lazy_import("sirf.STIR")
 
 log = logging.getLogger('petric')
 TEAM = os.getenv("GITHUB_REPOSITORY", "SyneRBI/PETRIC-").split("/PETRIC-", 1)[-1]
@@ -40,6 +63,9 @@ VERSION = os.getenv("GITHUB_REF_NAME", "")
 OUTDIR = Path(f"/o/logs/{TEAM}/{VERSION}" if TEAM and VERSION else "./output")
 if not (SRCDIR := Path("/mnt/share/petric")).is_dir():
     SRCDIR = Path("./data")
+# NB: when run as a script (`__main__`, or `__mp_main__` in spawned workers), submissions' `from petric import ...`
+# must get this module rather than a second copy (e.g. for `isinstance(callback, MetricsWithTimeout)`)
+sys.modules.setdefault("petric", sys.modules[__name__])
 
 
 class Callback(cil_callbacks.Callback):
@@ -56,110 +82,289 @@ class Callback(cil_callbacks.Callback):
                                     algo.update_objective_interval) != 0 and algo.iteration != algo.max_iteration
 
 
-class SaveIters(Callback):
-    """Saves `algo.x` as "iter_{algo.iteration:04d}.hv" and `algo.loss` in `csv_file`"""
-    def __init__(self, outdir=OUTDIR, csv_file='objectives.csv', **kwargs):
+class Snapshot:
+    """
+    Read-only copy (`array`) of `image` (e.g. `algo.x`) at `iteration`, only taken on first access (and then shared).
+    NB: `image` is not copied, i.e. only valid during the iteration (e.g. for STIR I/O without a copy).
+    """
+    def __init__(self, image: STIR.ImageData, iteration: int | str | None = None):
+        self.image = image
+        self.iteration = iteration
+
+    @cached_property
+    def array(self) -> np.ndarray:
+        arr = self.image.as_array()
+        # NB: CIL/numpy-backed images return a view rather than a copy
+        if isinstance(view := getattr(self.image, "array", None), np.ndarray) and np.may_share_memory(arr, view):
+            arr = arr.copy()
+        arr.flags.writeable = False
+        return arr
+
+
+class SnapshotCallback(Callback, ABC):
+    """
+    `Callback` which uses `snapshot.array` rather than copying `algo.x` itself, such that callers
+    (e.g. `MetricsWithTimeout`) can share a single `Snapshot` per iteration amongst callbacks.
+    NB: `snapshot` is optional, i.e. these can still be used as plain `Callback`s.
+    """
+    @abstractmethod
+    def __call__(self, algo: Algorithm, snapshot: Snapshot | None = None):
+        """snapshot: of `algo.x` at `algo.iteration` (if `None`, use `algo.x` instead)"""
+
+
+class SaveIters(SnapshotCallback):
+    """
+    Saves `algo.x` as "iter_{algo.iteration:04d}.hv" and `algo.loss` in `csv_file`
+
+    queue_size: if positive, a copy of `algo.x` is put in a queue of this size (blocking when full)
+      and written by a background thread. Use `flush()` to wait for pending writes, and `close()` to stop the thread.
+    store: if set, filename of an `IterateStore` (in `outdir`) to use instead of
+      one Interfile image per iteration (the final iterate is still saved as "iter_final.hv").
+    resume: if set, iteration to resume from (keeping `csv_file` rows & `store` iterates up to it).
+    """
+    def __init__(self, outdir=OUTDIR, csv_file='objectives.csv', queue_size: int = 0, store: str | None = None,
+                 resume: int | None = None, **kwargs):
         super().__init__(**kwargs)
         self.outdir = Path(outdir)
         self.outdir.mkdir(parents=True, exist_ok=True)
-        self.csv = csv.writer((self.outdir / csv_file).open("w", buffering=1))
-        self.csv.writerow(("iter", "objective"))
-
-    def __call__(self, algo: Algorithm):
+        rows: list = [("iter", "objective")]
+        if resume is not None and (csv_path := self.outdir / csv_file).is_file():
+            with csv_path.open(newline="") as fd:
+                rows = [row for i, row in enumerate(csv.reader(fd)) if i == 0 or int(row[0]) <= resume]
+        self._csv_fd = (self.outdir / csv_file).open("w", buffering=1, newline="")
+        self.csv = csv.writer(self._csv_fd)
+        self.csv.writerows(rows)
+        self.store = None
+        if store is not None:
+            if resume is None:
+                (self.outdir / store).unlink(missing_ok=True)
+            self.store = IterateStore(self.outdir / store)
+            if resume is not None:
+                self.store.truncate(resume)
+        self.queue: Queue | None = None
+        self._header: str | None = None # Interfile header template for background writes
+        self._dtype = np.dtype(np.float32)
+        self._error: Exception | None = None
+        if queue_size > 0:
+            self.queue = Queue(maxsize=queue_size)
+            Thread(target=self._writer, name=f"SaveIters({self.outdir})", daemon=True).start()
+            atexit.register(self.close)
+
+    def __call__(self, algo: Algorithm, snapshot: Snapshot | None = None):
+        snapshot = Snapshot(algo.x, algo.iteration) if snapshot is None else snapshot
         if not self.skip_iteration(algo):
             log.debug("saving iter %d...", algo.iteration)
-            algo.x.write(str(self.outdir / f'iter_{algo.iteration:04d}.hv'))
-            self.csv.writerow((algo.iteration, algo.get_last_loss()))
+            self.save(algo.x, algo.iteration, (algo.iteration, algo.get_last_loss()), snapshot)
             log.debug("...saved")
         if algo.iteration == algo.max_iteration:
-            algo.x.write(str(self.outdir / 'iter_final.hv'))
+            self.save(algo.x, 'final', snapshot=snapshot)
+            self.flush()
 
+    def save(self, image: STIR.ImageData, iteration: int | str, csv_row: tuple | None = None,
+             snapshot: Snapshot | None = None):
+        """
+        Writes `image` as "iter_{iteration:04d}.hv" (or in `store` for integer `iteration`),
+        in the background if possible, and `csv_row` (if any) in `csv_file`.
+        snapshot: of `image`, to use (rather than copying `image`) if an array is needed.
+        """
+        snapshot = Snapshot(image, iteration) if snapshot is None else snapshot
+        if self.queue is None or (self._header is None and (self.store is None or isinstance(iteration, str))):
+            self.flush()
+            self._write(iteration, snapshot.array if self.store is not None and isinstance(iteration, int) else image,
+                        csv_row)
+            return
+        if self._error is not None:
+            self.flush()
+        self.queue.put((iteration, snapshot.array, csv_row))
+
+    def flush(self):
+        """Waits for pending background writes (if any) and re-raises their errors"""
+        if self.queue is not None:
+            self.queue.join()
+        if (error := self._error) is not None:
+            self._error = None
+            raise error
+
+    def close(self):
+        """`flush()`, then stops the background thread (if any) and closes `csv_file`"""
+        try:
+            self.flush()
+        finally:
+            if self.queue is not None:
+                atexit.unregister(self.close)
+                self.queue.put(None)
+                self.queue = None
+            self._csv_fd.close()
+
+    def _write(self, iteration: int | str, image: STIR.ImageData | np.ndarray, csv_row: tuple | None):
+        stem = f'iter_{iteration:04d}' if isinstance(iteration, int) else f'iter_{iteration}'
+        if self.store is not None and isinstance(iteration, int):
+            self.store.append(iteration, image if isinstance(image, np.ndarray) else image.as_array())
+        elif isinstance(image, np.ndarray):
+            # NB: `self._header` is set before any arrays are queued
+            image.astype(self._dtype, copy=False).tofile(self.outdir / f'{stem}.v')
+            (self.outdir / f'{stem}.hv').write_text(
+                re.sub(r"(?im)^(!?name of data file\s*:=).*$", rf"\g<1> {stem}.v", str(self._header)))
+        else:
+            image.write(str(hv := self.outdir / f'{stem}.hv'))
+            if self.queue is not None and self._header is None: # use STIR's header as template for `_writer`
+                self._header, self._dtype = hv.read_text(), interfile_dtype(read_interfile_header(hv))
+        if csv_row is not None:
+            self.csv.writerow(csv_row)
+
+    def _writer(self):
+        assert self.queue is not None
+        queue = self.queue
+        while (item := queue.get()) is not None:
+            iteration, arr, csv_row = item
+            try:
+                self._write(iteration, arr, csv_row)
+            except Exception as exc:
+                log.error("failed to save iter %s: %s", iteration, exc)
+                self._error = exc
+            finally:
+                queue.task_done()
+
+
+class StatsLog(SnapshotCallback):
+    """
+    Log image slices & objective value.
 
-class StatsLog(Callback):
-    """Log image slices & objective value"""
+    image_interval: log slices every `image_interval` iterations (default: `interval`).
+    thumbnail: downsampling factor for the logged slices.
+    purge_step: discard previous TensorBoard events in `logdir` from this step onwards (e.g. when resuming).
+    NB: slices are logged as `uint8` (as TensorBoard would store them anyway). The DEBUG-level "normalised_change"
+    `norm(x - x_prev) / norm(x)` keeps (a reference to) the previous `snapshot.array` as `x_prev`.
+    """
     def __init__(self, transverse_slice=None, coronal_slice=None, sagittal_slice=None, vmax=None, logdir=OUTDIR,
-                 **kwargs):
+                 image_interval: int | None = None, thumbnail: int = 1, purge_step: int | None = None, **kwargs):
         super().__init__(**kwargs)
         self.transverse_slice = transverse_slice
         self.coronal_slice = coronal_slice
         self.sagittal_slice = sagittal_slice
         self.vmax = vmax
+        self.image_interval = self.interval if image_interval is None else image_interval
+        self.thumbnail = thumbnail
         self.x_prev = None
-        self.tb = logdir if isinstance(logdir, SummaryWriter) else SummaryWriter(logdir=str(logdir))
+        # NB: deferred import (slow)
+        from tensorboardX import SummaryWriter
+        self.tb = logdir if isinstance(logdir, SummaryWriter) else SummaryWriter(logdir=str(logdir),
+                                                                                 purge_step=purge_step)
 
-    def __call__(self, algo: Algorithm):
+    def __call__(self, algo: Algorithm, snapshot: Snapshot | None = None):
         if self.skip_iteration(algo):
             return
         t = self._time_
         log.debug("logging iter %d...", algo.iteration)
-        # initialise `None` values
-        self.transverse_slice = algo.x.dimensions()[0] // 2 if self.transverse_slice is None else self.transverse_slice
-        self.coronal_slice = algo.x.dimensions()[1] // 2 if self.coronal_slice is None else self.coronal_slice
-        self.sagittal_slice = algo.x.dimensions()[2] // 2 if self.sagittal_slice is None else self.sagittal_slice
-        self.vmax = algo.x.max() if self.vmax is None else self.vmax
-
         if log.getEffectiveLevel() <= logging.DEBUG:
             self.tb.add_scalar("objective", algo.get_last_loss(), algo.iteration, t)
+            snapshot = Snapshot(algo.x, algo.iteration) if snapshot is None else snapshot
             if self.x_prev is not None:
-                normalised_change = (algo.x - self.x_prev).norm() / algo.x.norm()
+                normalised_change = np.linalg.norm(snapshot.array - self.x_prev) / np.linalg.norm(snapshot.array)
                 self.tb.add_scalar("normalised_change", normalised_change, algo.iteration, t)
-            self.x_prev = algo.x.clone()
-        x_arr = algo.x.as_array()
-        self.tb.add_image("transverse", np.clip(x_arr[None, self.transverse_slice] / self.vmax, 0, 1), algo.iteration,
-                          t)
-        self.tb.add_image("coronal", np.clip(x_arr[None, :, self.coronal_slice] / self.vmax, 0, 1), algo.iteration, t)
-        self.tb.add_image("sagittal", np.clip(x_arr[None, :, :, self.sagittal_slice] / self.vmax, 0, 1), algo.iteration,
-                          t)
+            self.x_prev = snapshot.array
+        if algo.iteration % self.image_interval == 0 or algo.iteration == algo.max_iteration:
+            for tag, img in self.slices(algo.x if snapshot is None else snapshot.array).items():
+                self.tb.add_image(tag, img[None], algo.iteration, t)
         log.debug("...logged")
 
-
-class QualityMetrics(ImageQualityCallback, Callback):
+    def slices(self, image: STIR.ImageData | np.ndarray) -> dict[str, np.ndarray]:
+        """`uint8` (transverse, coronal, sagittal) slices of `image` (scaled by `vmax`, downsampled by `thumbnail`)"""
+        # NB: CIL/numpy-backed images expose a view (`.array`); SIRF only has `as_array()` (a full copy)
+        if isinstance(image, np.ndarray):
+            arr = image
+        elif isinstance(getattr(image, "array", None), np.ndarray):
+            arr = image.array
+        else:
+            arr = image.as_array()
+        # initialise `None` values
+        self.transverse_slice = arr.shape[0] // 2 if self.transverse_slice is None else self.transverse_slice
+        self.coronal_slice = arr.shape[1] // 2 if self.coronal_slice is None else self.coronal_slice
+        self.sagittal_slice = arr.shape[2] // 2 if self.sagittal_slice is None else self.sagittal_slice
+        self.vmax = arr.max() if self.vmax is None else self.vmax
+        step = slice(None, None, self.thumbnail)
+        res = {
+            "transverse": arr[self.transverse_slice, step, step], "coronal": arr[step, self.coronal_slice, step],
+            "sagittal": arr[step, step, self.sagittal_slice]}
+        return {tag: (img * (255 / self.vmax)).clip(0, 255).astype(np.uint8) for tag, img in res.items()}
+
+
+class QualityMetrics(ImageQualityCallback, SnapshotCallback):
     """From https://github.com/SyneRBI/PETRIC/wiki#metrics-and-thresholds"""
     THRESHOLD = {"AEM_VOI": 0.005, "RMSE_whole_object": 0.01, "RMSE_background": 0.01}
 
     def __init__(self, reference_image, whole_object_mask, background_mask, interval: int = 1,
-                 threshold_window: int = 10, **kwargs):
+                 threshold_window: int = 10, pass_csv=None, **kwargs):
+        """
+        threshold_window: number of evaluations metrics must remain below `THRESHOLD` to stop (see `PassDetector`).
+        pass_csv: optional file to write (metric, iteration, time) when each metric first passes.
+        """
         # TODO: drop multiple inheritance once `interval` included in CIL
         Callback.__init__(self, interval=interval)
         ImageQualityCallback.__init__(self, reference_image, **kwargs)
-        self.whole_object_indices = np.where(whole_object_mask.as_array())
-        self.background_indices = np.where(background_mask.as_array())
         self.ref_im_arr = reference_image.as_array()
-        self.norm = self.ref_im_arr[self.background_indices].mean()
+        regions = [whole_object_mask.as_array(), background_mask.as_array()]
+        for _, voi_indices in sorted(self.voi_indices.items()):
+            regions.append(np.zeros(self.ref_im_arr.shape, dtype=bool))
+            regions[-1][voi_indices] = True
+        self.region_metrics = RegionMetrics(self.ref_im_arr, regions)
+        self.norm = self.region_metrics.norm
         self.threshold_window = threshold_window
-        self.threshold_iters = 0
+        self.pass_detector = PassDetector(self.thresholds(), threshold_window)
+        self.pass_csv = pass_csv
 
-    def __call__(self, algo: Algorithm):
+    @property
+    def threshold_iters(self) -> int:
+        """number of consecutive evaluations with all metrics below `THRESHOLD`"""
+        return self.pass_detector.run
+
+    def __call__(self, algo: Algorithm, snapshot: Snapshot | None = None):
         if self.skip_iteration(algo):
             return
         t = self._time_
         # log metrics
-        metrics = self.evaluate(algo.x)
+        metrics = self.evaluate(algo.x if snapshot is None else snapshot.array)
         for tag, value in metrics.items():
             self.tb_summary_writer.add_scalar(tag, value, algo.iteration, t)
+        # log time to threshold (relative to `MetricsWithTimeout.reset()`, if available)
+        for j in self.pass_detector.update(list(metrics.values()), algo.iteration, t - getattr(self, "_start_", 0)):
+            self.log_pass(self.keys()[j], *self.pass_detector.passes[j][1:])
         # stop if `all(metrics < THRESHOLD)` for `threshold_window` iters
+        if self.pass_detector.passed is not None:
+            self.log_pass("all", *self.pass_detector.passed[1:])
+            raise StopIteration
+
+    def log_pass(self, tag: str, iteration: int, time: float):
+        """Log (to TensorBoard & `pass_csv`) `iteration` & `time` at which metric `tag` started to pass"""
+        log.info("%s passed at iteration %d (%.1fs)", tag, iteration, time)
+        if self.tb_summary_writer is not None:
+            self.tb_summary_writer.add_scalar(f"pass_time/{tag}", time, iteration)
+        if self.pass_csv is not None:
+            if new := not Path(self.pass_csv).is_file():
+                Path(self.pass_csv).parent.mkdir(parents=True, exist_ok=True)
+            with Path(self.pass_csv).open("a", newline="") as fd:
+                writer = csv.writer(fd)
+                if new:
+                    writer.writerow(("metric", "iter", "time"))
+                writer.writerow((tag, iteration, time))
+
+    def thresholds(self) -> list[float]:
+        """`THRESHOLD` for each of `keys()`"""
         # NB: need to strip suffix from "AEM_VOI" tags
-        if all(value <= self.THRESHOLD[re.sub("^(AEM_VOI)_.*", r"\1", tag)] for tag, value in metrics.items()):
-            self.threshold_iters += 1
-            if self.threshold_iters >= self.threshold_window:
-                raise StopIteration
-        else:
-            self.threshold_iters = 0
+        return [self.THRESHOLD[re.sub("^(AEM_VOI)_.*", r"\1", tag)] for tag in self.keys()]
 
-    def evaluate(self, test_im: STIR.ImageData) -> dict[str, float]:
+    def evaluate(self, test_im: STIR.ImageData | np.ndarray) -> dict[str, float]:
         assert not any(self.filter.values()), "Filtering not implemented"
-        test_im_arr = test_im.as_array()
-        whole = {
-            "RMSE_whole_object": np.sqrt(
-                mse(self.ref_im_arr[self.whole_object_indices], test_im_arr[self.whole_object_indices])) / self.norm,
-            "RMSE_background": np.sqrt(
-                mse(self.ref_im_arr[self.background_indices], test_im_arr[self.background_indices])) / self.norm}
-        local = {
-            f"AEM_VOI_{voi_name}": np.abs(test_im_arr[voi_indices].mean() - self.ref_im_arr[voi_indices].mean()) /
-            self.norm
-            for voi_name, voi_indices in sorted(self.voi_indices.items())}
-        self._evaluate_cache = {**whole, **local}
-        return self._evaluate_cache
+        test_im_arr = test_im if isinstance(test_im, np.ndarray) else test_im.as_array()
+        self._evaluate_cache = metrics = dict(zip(self.keys(), self.region_metrics(test_im_arr)))
+        return metrics
+
+    def digest(self) -> str:
+        """Hash of the reference image, masks & metric names, i.e. everything `evaluate` depends on"""
+        digest = hashlib.blake2b(" ".join(self.keys()).encode(), digest_size=16)
+        for arr in (self.region_metrics.indices, self.region_metrics.labels, self.region_metrics.ref_values):
+            digest.update(np.ascontiguousarray(arr).tobytes())
+        return digest.hexdigest()
 
     def keys(self):
         return ["RMSE_whole_object", "RMSE_background"] + [f"AEM_VOI_{name}" for name in sorted(self.voi_indices)]
@@ -171,48 +376,140 @@ class QualityMetrics(ImageQualityCallback, Callback):
         The values must remain below the respective thresholds for at least `window` number of entries.
         Otherwise raises IndexError.
         """
-        thr_arr = np.asanyarray(thresh)
+        detector = PassDetector(thresh, window)
         assert metrics.ndim == 2
-        assert thr_arr.ndim == 1
-        assert metrics.shape[1] == thr_arr.shape[0]
-        passed = (metrics <= thr_arr[None]).all(axis=1)
-        res = binary_erosion(passed, structure=np.ones(window), origin=-(window // 2))
-        return np.where(res)[0][0]
+        assert metrics.shape[1] == detector.thresholds.shape[0]
+        for m in metrics:
+            detector.update(m)
+            if detector.passed is not None:
+                return detector.passed[0]
+        raise IndexError("metrics did not pass thresholds")
 
 
 class MetricsWithTimeout(Callback):
-    """Stops the algorithm after `seconds`"""
+    """
+    Stops the algorithm after `seconds` (excluding time spent in `callbacks`).
+    `SnapshotCallback`s amongst `callbacks` share a single `Snapshot` of `algo.x` per iteration.
+    `elapsed` (`remaining`) is the time (excluding `callbacks`) since `reset()` (until timeout),
+    and `timed_out` whether the timeout was reached.
+
+    profile: if not `None`, time `algo.update`, `algo.update_objective` & each of `callbacks` every iteration
+      (see `Profiler`, writing `outdir/profile.csv`), keeping sampled call stacks of the `profile` slowest iterations.
+      Defaults to `$PETRIC_PROFILE` (if set).
+    checkpoint_interval: if positive, save a `Checkpoint` every `checkpoint_interval` iterations.
+    resume: continue the CSV & TensorBoard logs in `outdir` from the last checkpoint (see `restore()`).
+    tqdm_class: progress bar (default: `tqdm.auto.tqdm`).
+    """
     def __init__(self, seconds=3600, outdir=OUTDIR, transverse_slice=None, coronal_slice=None, sagittal_slice=None,
-                 tqdm_class=tqdm, **kwargs):
+                 tqdm_class=None, save_queue_size: int = 0, save_store: str | None = None,
+                 image_interval: int | None = None, thumbnail: int = 1, profile: int | None = None,
+                 checkpoint_interval: int = 0, resume: bool = False, **kwargs):
         super().__init__(**kwargs)
+        if tqdm_class is None:
+            from tqdm.auto import tqdm as tqdm_class
         self._seconds = seconds
+        self.checkpoint = Checkpoint(outdir, checkpoint_interval, flush=self.flush)
+        state = self.checkpoint.read() if resume else None
+        resume_iteration = None if state is None else state["iteration"]
         self.callbacks = [
             cil_callbacks.ProgressCallback(desc=f"{TEAM}/{VERSION}/{outdir.name}", tqdm_class=tqdm_class),
-            SaveIters(outdir=outdir, **kwargs),
+            SaveIters(outdir=outdir, queue_size=save_queue_size, store=save_store, resume=resume_iteration, **kwargs),
             (tb_cbk := StatsLog(logdir=outdir, transverse_slice=transverse_slice, coronal_slice=coronal_slice,
-                                sagittal_slice=sagittal_slice, **kwargs))]
+                                sagittal_slice=sagittal_slice, image_interval=image_interval, thumbnail=thumbnail,
+                                purge_step=None if resume_iteration is None else resume_iteration + 1, **kwargs))]
+        if checkpoint_interval > 0:
+            self.callbacks.append(self.checkpoint)
         self.tb = tb_cbk.tb # convenient access to the underlying SummaryWriter
+        if profile is None and os.getenv("PETRIC_PROFILE"):
+            profile = int(os.environ["PETRIC_PROFILE"])
+        self.profiler = None if profile is None else Profiler(self.tb, outdir / "profile.csv", slowest=profile)
         self.reset()
 
+    @property
+    def remaining(self) -> float:
+        """time left (excluding `callbacks`) as of the last call"""
+        return self._seconds - self.elapsed
+
     def reset(self):
         self.offset = 0
-        self.limit = (now := time()) + self._seconds
+        self.start = (now := time())
+        self.limit = now + self._seconds
+        self.elapsed = 0.0
+        self.timed_out = False
         self.tb.add_scalar("reset", 0, -1, now) # for relative timing calculation
 
+    def restore(self, algo: Algorithm) -> bool:
+        """Restores `algo` & `elapsed` from the last checkpoint (if any). Returns whether a checkpoint was found"""
+        if (state := self.checkpoint.load(algo)) is None:
+            return False
+        self.offset = 0
+        self.start = time() - state["elapsed"]
+        self.limit = self.start + self._seconds
+        self.elapsed = state["elapsed"]
+        self.tb.add_scalar("reset", 0, -1, self.start)
+        return True
+
     def __call__(self, algo: Algorithm):
-        if (time_excluding_metrics := (now := time()) - self.offset) > self.limit:
+        time_excluding_metrics = (now := time()) - self.offset
+        self.elapsed = time_excluding_metrics - self.start
+        if time_excluding_metrics > self.limit:
             log.warning("Timeout reached. Stopping algorithm.")
+            self.timed_out = True
             self.tb.add_scalar("reset", 0, algo.iteration, time_excluding_metrics)
+            self.flush()
             raise StopIteration
-        for c in self.callbacks:
-            c._time_ = time_excluding_metrics
-            c(algo)
-        if isinstance(self.callbacks[-1], QualityMetrics) and isinstance(self.callbacks[0],
-                                                                         cil_callbacks.ProgressCallback):
-            self.callbacks[0].pbar.set_postfix(
-                RMSE_whole_object=self.callbacks[-1]._evaluate_cache['RMSE_whole_object'], refresh=False)
+        # NB: `attach` before `algo.run` to also profile the first update
+        self.attach(algo)
+        profiler = self.profiler
+        # NB: a single (lazily taken) copy of `algo.x` for all `callbacks`
+        snapshot = Snapshot(algo.x, algo.iteration)
+        try:
+            for c in self.callbacks:
+                c._time_ = time_excluding_metrics
+                c._start_ = self.start
+                with nullcontext() if profiler is None else profiler.phase(type(c).__name__):
+                    if isinstance(c, SnapshotCallback):
+                        c(algo, snapshot)
+                    else:
+                        c(algo)
+        except StopIteration:
+            self.flush()
+            raise
+        finally:
+            if profiler is not None:
+                profiler.end_iteration(algo.iteration, time_excluding_metrics)
+        if (qm := self.find(QualityMetrics)) is not None and (progress := self.find(
+                cil_callbacks.ProgressCallback)) is not None:
+            progress.pbar.set_postfix(RMSE_whole_object=qm._evaluate_cache['RMSE_whole_object'], refresh=False)
         self.offset += time() - now
 
+    def find(self, cls: type[cil_callbacks.Callback]) -> cil_callbacks.Callback | None:
+        """The first of `callbacks` which is an instance of `cls` (if any)"""
+        return next((c for c in self.callbacks if isinstance(c, cls)), None)
+
+    def attach(self, algo: Algorithm):
+        """Wraps `algo.update` & `algo.update_objective` for timing by `profiler` (if any & not already wrapped)"""
+        if (profiler := self.profiler) is not None and getattr(algo, "_profiler_", None) is not profiler:
+            algo._profiler_ = profiler
+            algo.update = profiler.wrap("update", algo.update)
+            algo.update_objective = profiler.wrap("objective", algo.update_objective)
+
+    def flush(self):
+        """Waits for pending background writes of `SaveIters` (and flushes `profiler`)"""
+        if self.profiler is not None:
+            self.profiler.flush()
+        for c in self.callbacks:
+            if isinstance(c, SaveIters):
+                c.flush()
+
+    def close(self):
+        """Closes `SaveIters` (see `SaveIters.close`) and `profiler`"""
+        if self.profiler is not None:
+            self.profiler.close()
+        for c in self.callbacks:
+            if isinstance(c, SaveIters):
+                c.close()
+
     @staticmethod
     def mean_absolute_error(y, x):
         return np.mean(np.abs(y, x))
@@ -235,8 +532,19 @@ def construct_RDP(penalty_strength, initial_image, kappa, max_scaling=1e-3):
     return prior
 
 
+@dataclass
+class Lazy:
+    """Field value of a `Dataset` which is only loaded (`load(dataset)`) on first access"""
+    load: Callable[["Dataset"], Any]
+
+
 @dataclass
 class Dataset:
+    """
+    Fields may be initialised with `Lazy` values, which are then loaded on first access (or all at once by `load()`).
+    Use `memmap` for read-only access to the raw data (without loading it in memory).
+    message_redirector: kept alive with the `Dataset`, so sirf.STIR messages (e.g. while loading) stay redirected.
+    """
     acquired_data: STIR.AcquisitionData
     additive_term: STIR.AcquisitionData
     mult_factors: STIR.AcquisitionData
@@ -249,49 +557,114 @@ class Dataset:
     voi_masks: dict[str, STIR.ImageData]
     FOV_mask: STIR.ImageData
     path: PurePath
-
-
-def get_data(srcdir=".", outdir=OUTDIR, sirf_verbosity=0, read_sinos=True):
+    message_redirector: STIR.MessageRedirector | None = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._lazy = {name: value for name, value in vars(self).items() if isinstance(value, Lazy)}
+        for name in self._lazy:
+            delattr(self, name)
+
+    def __getattr__(self, name: str):
+        # NB: only called for attributes which are not set, i.e. `Lazy` fields not yet loaded
+        if (lazy := self.__dict__.get("_lazy", {}).get(name)) is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        log.debug("loading %s...", name)
+        setattr(self, name, value := lazy.load(self))
+        del self._lazy[name] # only once loaded, such that a failed `load` is retried (& raises again) on next access
+        return value
+
+    def load(self) -> Dataset:
+        """Loads all `Lazy` fields not yet loaded (e.g. before timing starts), returning `self`"""
+        for name in list(self.__dict__.get("_lazy", {})):
+            getattr(self, name)
+        return self
+
+    def memmap(self, name: str) -> np.memmap:
+        """Read-only memory-map of the data of `path / name` (".hs" or ".hv"), e.g. `name="PETRIC/VOI_background"`"""
+        for suffix in (".hs", ".hv"):
+            if (header := Path(self.path) / f"{name}{suffix}").is_file():
+                return read_interfile_memmap(header)
+        raise FileNotFoundError(f"{name}.hs or {name}.hv not found in {self.path}")
+
+
+def get_data(srcdir=".", outdir=OUTDIR, sirf_verbosity=0, read_sinos=True, warm_start: WarmStartBank | None = None):
     """
-    Load data from `srcdir`, constructs prior and return as a `Dataset`.
-    Also redirects sirf.STIR log output to `outdir`, unless that's set to None
+    Return a `Dataset` in `srcdir`. Data is loaded (and the prior constructed) on first access of `Dataset` fields
+    (or by `Dataset.load()`).
+    Also redirects sirf.STIR log output to `outdir` (while the `Dataset` exists), unless that's set to None.
+    warm_start: if it has an entry for this dataset & prior, replaces `OSEM_image` (i.e. the initial image).
+      NB: the prior (epsilon) is still constructed from "OSEM_image.hv", so the objective is unchanged.
     """
     srcdir = Path(srcdir)
     STIR.set_verbosity(sirf_verbosity)                # set to higher value to diagnose problems
     STIR.AcquisitionData.set_storage_scheme('memory') # needed for get_subsets()
 
+    message_redirector = None
     if outdir is not None:
         outdir = Path(outdir)
-        _ = STIR.MessageRedirector(str(outdir / 'info.txt'), str(outdir / 'warnings.txt'), str(outdir / 'errors.txt'))
-    acquired_data = STIR.AcquisitionData(str(srcdir / 'prompts.hs')) if read_sinos else None
-    additive_term = STIR.AcquisitionData(str(srcdir / 'additive_term.hs')) if read_sinos else None
-    mult_factors = STIR.AcquisitionData(str(srcdir / 'mult_factors.hs')) if read_sinos else None
-    OSEM_image = STIR.ImageData(str(srcdir / 'OSEM_image.hv'))
+        outdir.mkdir(parents=True, exist_ok=True)
+        message_redirector = STIR.MessageRedirector(str(outdir / 'info.txt'), str(outdir / 'warnings.txt'),
+                                                    str(outdir / 'errors.txt'))
+
+    def get_sino(fname):
+        return Lazy(lambda _: STIR.AcquisitionData(str(srcdir / fname))) if read_sinos else None
+
+    def get_image(fname, optional=True):
+        if not optional or (srcdir / fname).is_file():
+            return Lazy(lambda _: STIR.ImageData(str(srcdir / fname)))
+        return None # explicit to suppress linter warnings
+
+    acquired_data = get_sino('prompts.hs')
+    additive_term = get_sino('additive_term.hs')
+    mult_factors = get_sino('mult_factors.hs')
+    OSEM_image = get_image('OSEM_image.hv', optional=False)
     # Find FOV mask
     # WARNING: we are currently using Parralelproj with default settings, which uses a cylindrical FOV.
     # The current code gives identical results to thresholding the sensitivity image (for those settings)
-    FOV_mask = STIR.TruncateToCylinderProcessor().process(OSEM_image.allocate(1))
-    kappa = STIR.ImageData(str(srcdir / 'kappa.hv'))
-    if (penalty_strength_file := (srcdir / 'penalisation_factor.txt')).is_file():
-        penalty_strength = float(np.loadtxt(penalty_strength_file))
-    else:
-        penalty_strength = 1 / 700 # default choice
-    prior = construct_RDP(penalty_strength, OSEM_image, kappa)
+    FOV_mask = Lazy(lambda data: STIR.TruncateToCylinderProcessor().process(data.OSEM_image.allocate(1)))
+    kappa = get_image('kappa.hv', optional=False)
+    penalty_strength = read_penalisation_factor(srcdir)
+    prior = Lazy(lambda data: construct_RDP(penalty_strength, data.OSEM_image, data.kappa))
+    if warm_start is not None:
 
-    def get_image(fname):
-        if (source := srcdir / 'PETRIC' / fname).is_file():
-            return STIR.ImageData(str(source))
-        return None # explicit to suppress linter warnings
+        def get_initial_image(_):
+            if (image := warm_start.get(srcdir, penalty_strength)) is not None:
+                return image
+            return STIR.ImageData(str(srcdir / 'OSEM_image.hv'))
+
+        OSEM_image = Lazy(get_initial_image)
+        prior = Lazy(
+            lambda data: construct_RDP(penalty_strength, STIR.ImageData(str(srcdir / 'OSEM_image.hv')), data.kappa))
 
-    reference_image = get_image('reference_image.hv')
-    whole_object_mask = get_image('VOI_whole_object.hv')
-    background_mask = get_image('VOI_background.hv')
-    voi_masks = {
-        voi.stem[4:]: STIR.ImageData(str(voi))
-        for voi in (srcdir / 'PETRIC').glob("VOI_*.hv") if voi.stem[4:] not in ('background', 'whole_object')}
+    reference_image = get_image('PETRIC/reference_image.hv')
+    whole_object_mask = get_image('PETRIC/VOI_whole_object.hv')
+    background_mask = get_image('PETRIC/VOI_background.hv')
+
+    def get_voi_masks(_):
+        return {
+            voi.stem[4:]: STIR.ImageData(str(voi))
+            for voi in (srcdir / 'PETRIC').glob("VOI_*.hv") if voi.stem[4:] not in ('background', 'whole_object')}
+
+    voi_masks = Lazy(get_voi_masks)
 
     return Dataset(acquired_data, additive_term, mult_factors, OSEM_image, prior, kappa, reference_image,
-                   whole_object_mask, background_mask, voi_masks, FOV_mask, srcdir.resolve())
+                   whole_object_mask, background_mask, voi_masks, FOV_mask, srcdir.resolve(), message_redirector)
+
+
+def read_penalisation_factor(srcdir=".", default: float = 1 / 700) -> float:
+    """Penalisation factor in `srcdir/penalisation_factor.txt` (see `get_penalisation_factor.py`), or `default`"""
+    if (penalty_strength_file := Path(srcdir) / 'penalisation_factor.txt').is_file():
+        return float(np.loadtxt(penalty_strength_file))
+    return default
+
+
+def get_num_subsets(srcdir=".", default: int = 7) -> int:
+    """
+    Number of subsets in `srcdir/num_subsets.txt` (see `SIRF_data_preparation/tune_num_subsets.py`), or `default`
+    """
+    if (num_subsets_file := Path(srcdir) / 'num_subsets.txt').is_file():
+        return int(np.loadtxt(num_subsets_file))
+    return default
 
 
 DATA_SLICES = {
@@ -304,71 +677,147 @@ DATA_SLICES = {
     'Mediso_NEMA_IQ_lowcounts': {'transverse_slice': 22, 'coronal_slice': 74, 'sagittal_slice': 70},
     'GE_DMI4_NEMA_IQ': {'transverse_slice': 27, 'coronal_slice': 109, 'sagittal_slice': 78}}
 
-if SRCDIR.is_dir() and not os.getenv("PETRIC_SKIP_DATA", False):
-    # create list of existing data
-    # NB: `MetricsWithTimeout` initialises `SaveIters` which creates `outdir`
-    data_dirs_metrics = [
-        (SRCDIR / "Siemens_mMR_NEMA_IQ", OUTDIR / "mMR_NEMA",
-         [MetricsWithTimeout(outdir=OUTDIR / "mMR_NEMA", **DATA_SLICES['Siemens_mMR_NEMA_IQ'])]),
-        (SRCDIR / "Siemens_mMR_NEMA_IQ_lowcounts", OUTDIR / "mMR_NEMA_lowcounts",
-         [MetricsWithTimeout(outdir=OUTDIR / "mMR_NEMA_lowcounts", **DATA_SLICES['Siemens_mMR_NEMA_IQ_lowcounts'])]),
-        (SRCDIR / "NeuroLF_Hoffman_Dataset", OUTDIR / "NeuroLF_Hoffman",
-         [MetricsWithTimeout(outdir=OUTDIR / "NeuroLF_Hoffman", **DATA_SLICES['NeuroLF_Hoffman_Dataset'])]),
-        (SRCDIR / "Siemens_Vision600_thorax", OUTDIR / "Vision600_thorax",
-         [MetricsWithTimeout(outdir=OUTDIR / "Vision600_thorax", **DATA_SLICES['Siemens_Vision600_thorax'])]),
-        (SRCDIR / "Siemens_mMR_ACR", OUTDIR / "mMR_ACR",
-         [MetricsWithTimeout(outdir=OUTDIR / "mMR_ACR", **DATA_SLICES['Siemens_mMR_ACR'])]),
-        (SRCDIR / "Mediso_NEMA_IQ", OUTDIR / "Mediso_NEMA",
-         [MetricsWithTimeout(outdir=OUTDIR / "Mediso_NEMA", **DATA_SLICES['Mediso_NEMA_IQ'])]),
-        (SRCDIR / "GE_DMI3_Torso", OUTDIR / "DMI3_Torso",
-         [MetricsWithTimeout(outdir=OUTDIR / "DMI3_Torso", **DATA_SLICES['GE_DMI3_Torso'])]),
-        (SRCDIR / "Siemens_Vision600_Hoffman", OUTDIR / "Vision600_Hoffman",
-         [MetricsWithTimeout(outdir=OUTDIR / "Vision600_Hoffman", **DATA_SLICES['Siemens_Vision600_Hoffman'])]),
-        (SRCDIR / "NeuroLF_Esser_Dataset", OUTDIR / "NeuroLF_Esser",
-         [MetricsWithTimeout(outdir=OUTDIR / "NeuroLF_Esser", **DATA_SLICES['NeuroLF_Esser_Dataset'])]),
-        (SRCDIR / "Siemens_Vision600_ZrNEMAIQ", OUTDIR / "Vision600_ZrNEMA",
-         [MetricsWithTimeout(outdir=OUTDIR / "Vision600_ZrNEMA", **DATA_SLICES['Siemens_Vision600_ZrNEMAIQ'])]),
-        (SRCDIR / "GE_D690_NEMA_IQ", OUTDIR / "D690_NEMA",
-         [MetricsWithTimeout(outdir=OUTDIR / "D690_NEMA", **DATA_SLICES['GE_D690_NEMA_IQ'])]),
-        (SRCDIR / "Mediso_NEMA_IQ_lowcounts", OUTDIR / "Mediso_NEMA_lowcounts",
-         [MetricsWithTimeout(outdir=OUTDIR / "Mediso_NEMA_lowcounts", **DATA_SLICES['Mediso_NEMA_IQ_lowcounts'])]),
-        (SRCDIR / "GE_DMI4_NEMA_IQ", OUTDIR / "DMI4_NEMA",
-         [MetricsWithTimeout(outdir=OUTDIR / "DMI4_NEMA", **DATA_SLICES['GE_DMI4_NEMA_IQ'])])]
-else:
-    log.warning("Source directory does not exist: %s", SRCDIR)
-    data_dirs_metrics = [(None, None, [])] # type: ignore
 
-if __name__ != "__main__":
-    # load up first data-set for people to play with
-    srcdir, outdir, metrics = data_dirs_metrics[0]
-    if srcdir is None:
-        data = None
-    else:
-        data = get_data(srcdir=srcdir, outdir=outdir)
-        metrics[0].reset()
-else:
-    from traceback import print_exc
+def create_metrics(srcdir: Path, outdir: Path, **kwargs) -> list[Callback]:
+    """
+    Returns the organisers' callbacks for data in `srcdir`, saving output in `outdir`.
+    NB: `MetricsWithTimeout` initialises `SaveIters` which creates `outdir`
+    """
+    return [MetricsWithTimeout(outdir=outdir, **DATA_SLICES.get(srcdir.name, {}), **kwargs)]
 
-    from docopt import docopt
-    from tqdm.contrib.logging import logging_redirect_tqdm
-    args = docopt(__doc__)
-    logging.basicConfig(level=getattr(logging, args["--log"].upper()))
-    redir = logging_redirect_tqdm()
-    redir.__enter__()
-    from main import Submission, submission_callbacks
+
+def run_submission(srcdir: Path, outdir: Path, metrics: list[Callback] | None = None, submission: str = "main",
+                   warm_start: WarmStartBank | None = None) -> dict:
+    """
+    Runs `Submission` from module `submission` on the data in `srcdir` until timeout (or `StopIteration`).
+    `metrics` defaults to `create_metrics(srcdir, outdir)`.
+    warm_start: initialise from (see `get_data`) and save to (see `SaveWarmStart`) this bank.
+    Returns a summary (dataset, status, iterations, time excluding metrics, wall time, setup time (`get_data` &
+    `Submission(data)`), init time (`Submission(data)`, included in time), time & iteration at which `QualityMetrics`
+    passed (if any), peak RSS, and last metrics).
+    """
+    module = import_module(submission)
+    Submission, submission_callbacks = module.Submission, module.submission_callbacks
     assert issubclass(Submission, Algorithm)
-    for srcdir, outdir, metrics in data_dirs_metrics:
-        data = get_data(srcdir=srcdir, outdir=outdir)
-        metrics_with_timeout = metrics[0]
+    wall_start = time()
+    if metrics is None:
+        metrics = create_metrics(srcdir, outdir)
+    summary: dict = {"dataset": outdir.name, "status": "error", "iterations": 0}
+    metrics_with_timeout = metrics[0]
+    try:
+        # NB: load all data (& construct the prior) before the timeout starts
+        data = get_data(srcdir=srcdir, outdir=outdir, warm_start=warm_start).load()
+        if warm_start is not None and data.reference_image is not None:
+            from petric_tools.warm_start import SaveWarmStart
+            metrics_with_timeout.callbacks.append(SaveWarmStart(warm_start, data))
         if data.reference_image is not None:
             metrics_with_timeout.callbacks.append(
                 QualityMetrics(data.reference_image, data.whole_object_mask, data.background_mask,
-                               tb_summary_writer=metrics_with_timeout.tb, voi_mask_dict=data.voi_masks))
+                               tb_summary_writer=metrics_with_timeout.tb, voi_mask_dict=data.voi_masks,
+                               pass_csv=outdir / "pass.csv"))
         metrics_with_timeout.reset() # timeout from now
         algo = Submission(data)
+        summary["init_time"] = time() - metrics_with_timeout.start
+        summary["setup_time"] = time() - wall_start
+        metrics_with_timeout.attach(algo)
         try:
             algo.run(np.inf, callbacks=metrics + submission_callbacks, update_objective_interval=np.inf)
-        except Exception:
-            print_exc(limit=2)
+            metrics_with_timeout.flush()
+            summary["status"] = "timeout" if metrics_with_timeout.timed_out else "stopped"
         finally:
+            summary["iterations"] = algo.iteration
+            metrics_with_timeout.close()
             del algo
+    except Exception:
+        print_exc(limit=2)
+    summary["time"] = metrics_with_timeout.elapsed
+    summary["wall_time"] = time() - wall_start
+    summary["peak_rss"] = peak_rss()
+    if (qm := metrics_with_timeout.find(QualityMetrics)) is not None:
+        if (passed := qm.pass_detector.passed) is not None:
+            summary["pass_iteration"], summary["pass_time"] = passed[1:]
+        if hasattr(qm, "_evaluate_cache"):
+            summary.update(qm._evaluate_cache)
+    return summary
+
+
+def write_summary(summaries: list[dict], csv_file=OUTDIR / "summary.csv"):
+    """Logs `summaries` (from `run_submission`) and writes them to `csv_file`"""
+    fieldnames = list(dict.fromkeys(key for summary in summaries for key in summary))
+    Path(csv_file).parent.mkdir(parents=True, exist_ok=True)
+    with Path(csv_file).open("w", newline="") as fd:
+        writer = csv.DictWriter(fd, fieldnames)
+        writer.writeheader()
+        writer.writerows(summaries)
+    for summary in summaries:
+        log.info("%(dataset)s: %(status)s after %(iterations)d iterations (%(time).1fs, wall %(wall_time).1fs)",
+                 summary)
+
+
+if SRCDIR.is_dir():
+    # create list of existing data
+    data_dirs = [(SRCDIR / "Siemens_mMR_NEMA_IQ", OUTDIR / "mMR_NEMA"),
+                 (SRCDIR / "Siemens_mMR_NEMA_IQ_lowcounts", OUTDIR / "mMR_NEMA_lowcounts"),
+                 (SRCDIR / "NeuroLF_Hoffman_Dataset", OUTDIR / "NeuroLF_Hoffman"),
+                 (SRCDIR / "Siemens_Vision600_thorax", OUTDIR / "Vision600_thorax"),
+                 (SRCDIR / "Siemens_mMR_ACR", OUTDIR / "mMR_ACR"), (SRCDIR / "Mediso_NEMA_IQ", OUTDIR / "Mediso_NEMA"),
+                 (SRCDIR / "GE_DMI3_Torso", OUTDIR / "DMI3_Torso"),
+                 (SRCDIR / "Siemens_Vision600_Hoffman", OUTDIR / "Vision600_Hoffman"),
+                 (SRCDIR / "NeuroLF_Esser_Dataset", OUTDIR / "NeuroLF_Esser"),
+                 (SRCDIR / "Siemens_Vision600_ZrNEMAIQ", OUTDIR / "Vision600_ZrNEMA"),
+                 (SRCDIR / "GE_D690_NEMA_IQ", OUTDIR / "D690_NEMA"),
+                 (SRCDIR / "Mediso_NEMA_IQ_lowcounts", OUTDIR / "Mediso_NEMA_lowcounts"),
+                 (SRCDIR / "GE_DMI4_NEMA_IQ", OUTDIR / "DMI4_NEMA")]
+else:
+    log.warning("Source directory does not exist: %s", SRCDIR)
+    data_dirs = []
+
+
+def __getattr__(name: str):
+    """
+    Lazily creates (on first access, e.g. `from petric import data, metrics`) the first dataset for people to play
+    with: `srcdir`, `outdir`, `metrics` (see `create_metrics`) & `data` (see `get_data`),
+    as well as `data_dirs_metrics` (`[(srcdir, outdir, metrics), ...]` for all `data_dirs`).
+    NB: all are `None` (or empty) if there is no data or `PETRIC_SKIP_DATA` is set.
+    """
+    cache = globals()
+    skip = not data_dirs or os.getenv("PETRIC_SKIP_DATA", False)
+    if name in ("srcdir", "outdir"):
+        cache["srcdir"], cache["outdir"] = (None, None) if skip else data_dirs[0]
+    elif name == "metrics":
+        cache["metrics"] = [] if skip else create_metrics(*data_dirs[0])
+    elif name == "data":
+        cache["data"] = None if skip else get_data(*data_dirs[0]).load()
+        # timeout from now
+        if cache.get("metrics"):
+            cache["metrics"][0].reset()
+    elif name == "data_dirs_metrics":
+        if skip:
+            cache["data_dirs_metrics"] = [(None, None, [])]
+        else:
+            metrics = cache["metrics"] if "metrics" in cache else __getattr__("metrics")
+            cache["data_dirs_metrics"] = [(srcdir, outdir, metrics if i == 0 else create_metrics(srcdir, outdir))
+                                          for i, (srcdir, outdir) in enumerate(data_dirs)]
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return cache[name]
+
+
+if __name__ == "__main__":
+    from docopt import docopt
+    from tqdm.contrib.logging import logging_redirect_tqdm
+
+    from petric_tools.parallel import THREAD_VARS, environ, run_parallel
+    args = docopt(__doc__)
+    logging.basicConfig(level=getattr(logging, args["--log"].upper()))
+    if args["--profile"] is not None:
+        os.environ["PETRIC_PROFILE"] = args["--profile"] # NB: inherited by `run_parallel` workers
+    redir = logging_redirect_tqdm()
+    redir.__enter__()
+    if (jobs := int(args["--jobs"])) > 1:
+        summaries = run_parallel(data_dirs, jobs, args["--threads"] and int(args["--threads"]))
+    else:
+        # NB: only affects libraries initialised from now on (e.g. sirf.STIR, imported lazily), unlike `run_parallel`
+        with environ(**dict.fromkeys(THREAD_VARS, args["--threads"])) if args["--threads"] else nullcontext():
+            summaries = [run_submission(srcdir, outdir) for srcdir, outdir in data_dirs]
+    write_summary(summaries)
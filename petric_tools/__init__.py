@@ -0,0 +1,45 @@
+"""
+ANY CHANGES TO THIS PACKAGE ARE IGNORED BY THE ORGANISERS (as for `petric.py`).
+
+Tools used by `petric.py` (and available to submissions), kept out of `petric.py` so that it remains a thin harness.
+
+- `interfile`: Interfile headers & read-only memory-maps of their data
+- `iterate_store`: `IterateStore`, a single file of compressed iterates
+- `metrics`: `RegionMetrics` (as in `petric.QualityMetrics`) & `PassDetector` (of metrics passing thresholds)
+- `profiler`: `Profiler`, per-phase timings of each iteration (and `peak_rss`)
+- `checkpoint`: `Checkpoint` (& restore) the state of an `Algorithm`, e.g. to resume after preemption
+- `subset_cache`: `SubsetCache`, reusing e.g. subset sensitivities across runs (in `CACHEDIR`)
+- `warm_start`: `WarmStartBank` of the best iterates of previous runs (in `CACHEDIR`), for use as initial images
+- `coarse_to_fine`: `CoarseToFine` multi-resolution driver for submissions
+- `parallel`: `run_parallel` & `run_isolated`, running submissions in spawned worker processes
+- `relaxation`: `TimeBudgetRelaxation`, a step-size rule for `BSREM`-like algorithms (needs `cil` but not `sirf`)
+
+NB: importing this package only imports the standard library, and `interfile`, `iterate_store`, `metrics` &
+`profiler` only add `numpy` (i.e. neither `sirf` nor `cil`).
+"""
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+#: root directory of persistent (on-disk) caches
+CACHEDIR = Path(os.getenv("PETRIC_CACHE", "~/.cache/petric")).expanduser()
+
+
+def lazy_import(name: str):
+    """
+    Returns module `name`, which is only executed on first attribute access
+    (see `importlib.util.LazyLoader`), e.g. to keep `import petric` fast.
+    """
+    if (module := sys.modules.get(name)) is not None:
+        return module
+    if (spec := importlib.util.find_spec(name)) is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    if "." in name:
+        parent, child = name.rsplit(".", 1)
+        setattr(sys.modules[parent], child, module)
+    return module
@@ -0,0 +1,100 @@
+"""`Checkpoint`: periodically save (& restore) the state of an `Algorithm`, e.g. to resume after preemption"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+from cil.optimisation.algorithms import Algorithm
+from cil.optimisation.utilities import callbacks as cil_callbacks
+from petric_tools import lazy_import
+
+STIR = lazy_import("sirf.STIR")
+log = logging.getLogger('petric_tools.checkpoint')
+
+
+def jsonable(state: dict) -> dict:
+    """Items of `state` which can be JSON-serialised (converting `numpy` scalars)"""
+    res = {}
+    for key, value in state.items():
+        try:
+            json.dumps(value, default=_json_default)
+        except (TypeError, ValueError):
+            continue
+        res[key] = value
+    return res
+
+
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"{type(obj).__name__} is not JSON serialisable")
+
+
+class Checkpoint(cil_callbacks.Callback):
+    """
+    Saves the state of `algo` every `interval` iterations in `outdir`: `algo.x` (as "checkpoint_{iteration:04d}.hv")
+    and (JSON-serialisable) `attrs` of `algo` and of its `objects` (e.g. step-size rules) in "checkpoint.json".
+    NB: "checkpoint.json" is replaced atomically after writing the image, so always refers to a complete checkpoint.
+    flush: called before saving (e.g. to wait for pending writes of previous iterates).
+    """
+    def __init__(self, outdir, interval: int = 100, attrs=("iteration", "subset", "loss", "iterations"),
+                 objects=("step_size_rule",), flush: Callable[[], Any] | None = None, **kwargs):
+        super().__init__(**kwargs)
+        self.interval = interval
+        self.outdir = Path(outdir)
+        self.attrs = attrs
+        self.objects = objects
+        self.flush = flush
+        self.json_file = self.outdir / "checkpoint.json"
+
+    def skip_iteration(self, algo: Algorithm) -> bool:
+        # NB: independent of `algo.update_objective_interval`
+        return self.interval <= 0 or algo.iteration <= 0 or algo.iteration % self.interval != 0
+
+    def __call__(self, algo: Algorithm):
+        if not self.skip_iteration(algo):
+            self.save(algo, self._time_ - self._start_)
+
+    def save(self, algo: Algorithm, elapsed: float = 0.0):
+        if self.flush is not None:
+            self.flush()
+        stem = f"checkpoint_{algo.iteration:04d}"
+        algo.x.write(str(self.outdir / f"{stem}.hv"))
+        state = {"image": f"{stem}.hv", "elapsed": elapsed}
+        state.update(jsonable({attr: getattr(algo, attr) for attr in self.attrs if hasattr(algo, attr)}))
+        for name in self.objects:
+            if (obj := getattr(algo, name, None)) is not None:
+                state[name] = jsonable(vars(obj))
+        tmp = self.json_file.with_suffix(f".tmp.{os.getpid()}")
+        tmp.write_text(json.dumps(state, default=_json_default))
+        os.replace(tmp, self.json_file)
+        for old in self.outdir.glob("checkpoint_*.*v"):
+            if old.stem != stem:
+                old.unlink()
+        log.info("saved checkpoint at iteration %d", algo.iteration)
+
+    def read(self) -> dict | None:
+        """The last saved state (if any)"""
+        return json.loads(self.json_file.read_text()) if self.json_file.is_file() else None
+
+    def load(self, algo: Algorithm) -> dict | None:
+        """Restores `algo` from the last saved state (if any), which is returned"""
+        if (state := self.read()) is None:
+            return None
+        algo.x.fill(STIR.ImageData(str(self.outdir / state["image"])))
+        for attr in self.attrs:
+            if attr in state:
+                if isinstance(value := getattr(algo, attr, None), list):
+                    value[:] = state[attr] # NB: may be a read-only property (e.g. `Algorithm.loss`)
+                else:
+                    setattr(algo, attr, state[attr])
+        for name in self.objects:
+            if name in state and (obj := getattr(algo, name, None)) is not None:
+                vars(obj).update(state[name])
+        log.info("loaded checkpoint at iteration %d", algo.iteration)
+        return state
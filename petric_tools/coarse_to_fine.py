@@ -0,0 +1,97 @@
+"""
+Coarse-to-fine (multi-resolution) reconstruction: `CoarseToFine` runs a `Submission` on a coarser image grid
+(see `zoom_dataset`) before continuing on the original grid.
+"""
+from __future__ import annotations
+
+import logging
+from copy import copy
+from typing import Callable
+
+from cil.optimisation.algorithms import Algorithm
+from petric import Dataset, construct_RDP
+from petric_tools import lazy_import
+
+STIR = lazy_import("sirf.STIR")
+log = logging.getLogger('petric_tools.coarse_to_fine')
+
+
+def zoom_dataset(data: Dataset, zoom: float = .5) -> Dataset:
+    """
+    Returns `data` on a coarser image grid (xy voxel sizes divided by `zoom`), e.g. for `CoarseToFine`.
+    Sinograms are shared with `data`, while `prior` (with the same penalisation factor) & `FOV_mask` are new.
+    NB: `reference_image` & VOIs are omitted.
+    NB: `path` is that of `data`, but `SubsetCache` entries are distinct (as keyed by the image geometry).
+    """
+    def downsample(image: STIR.ImageData) -> STIR.ImageData:
+        size = (-1, *(max(round(n * zoom), 1) for n in image.dimensions()[1:]))
+        return image.zoom_image(zooms=(1, zoom, zoom), offsets_in_mm=(0, 0, 0), size=size, scaling="preserve_values")
+
+    OSEM_image, kappa = downsample(data.OSEM_image), downsample(data.kappa)
+    prior = construct_RDP(data.prior.get_penalisation_factor(), OSEM_image, kappa)
+    FOV_mask = STIR.TruncateToCylinderProcessor().process(OSEM_image.allocate(1))
+    return Dataset(data.acquired_data, data.additive_term, data.mult_factors, OSEM_image, prior, kappa, None, None,
+                   None, {}, FOV_mask, data.path)
+
+
+class CoarseToFine(Algorithm):
+    """
+    Multi-resolution driver: runs `Submission(zoom_dataset(data, zoom))` for `coarse_updates`, then continues with
+    `Submission(data)` initialised with the (upsampled) coarse iterate, e.g. (in `main.py`):
+
+    >>> class Submission(CoarseToFine):
+    ...     def __init__(self, data):
+    ...         super().__init__(data, main_BSREM.Submission, coarse_updates=50)
+
+    or with (cached) OSEM, where the coarse & fine stages use separate `SubsetCache` entries (e.g. sensitivities):
+
+    >>> class Submission(CoarseToFine):
+    ...     def __init__(self, data):
+    ...         super().__init__(data, partial(main_OSEM.Submission, cache=True),
+    ...                          coarse_updates=2 * get_num_subsets(data.path))
+
+    NB: `x` is always on the grid of `data.OSEM_image` (upsampled during the coarse stage, once per iteration).
+    NB: `stage.iteration` is kept equal to `iteration` (e.g. continuing step-size relaxation after refinement).
+    """
+    def __init__(self, data: Dataset, Submission: Callable[..., Algorithm], coarse_updates: int = 20, zoom: float = .5,
+                 coarse_kwargs: dict | None = None, fine_kwargs: dict | None = None, **kwargs):
+        self.data = data
+        self.Submission = Submission
+        self.coarse_updates = coarse_updates
+        self.fine_kwargs = fine_kwargs or {}
+        self.stage = Submission(zoom_dataset(data, zoom), **(coarse_kwargs or {}))
+        self.coarse = True
+        self._x: tuple[int, STIR.ImageData] | None = None # (iteration, upsampled coarse iterate)
+        super().__init__(**kwargs)
+        self.configured = True                            # required by Algorithm
+
+    @property
+    def x(self) -> STIR.ImageData:
+        if not self.coarse:
+            return self.stage.x
+        if self._x is None or self._x[0] != self.iteration:
+            self._x = self.iteration, self.stage.x.zoom_image_as_template(self.data.OSEM_image,
+                                                                          scaling="preserve_values")
+        return self._x[1]
+
+    def refine(self):
+        """Switches to `Submission(data)`, initialised with the (upsampled) current iterate"""
+        log.info("refining at iteration %d", self.iteration)
+        data = copy(self.data) # NB: keeps `Lazy` fields of `self.data` unloaded
+        data._lazy = {name: lazy for name, lazy in self.data._lazy.items() if name != "OSEM_image"}
+        data.OSEM_image = self.x
+        self.stage = self.Submission(data, **self.fine_kwargs)
+        self.coarse = False
+        self._x = None
+
+    def update(self):
+        if self.coarse and self.iteration >= self.coarse_updates:
+            self.refine()
+        self.stage.iteration = self.iteration
+        self.stage.update()
+
+    def update_objective(self):
+        """NB: the objective (of the current `stage`) changes after `refine()`"""
+        self.stage.iteration = self.iteration
+        value = self.stage.update_objective()
+        self.loss.append(self.stage.get_last_loss() if value is None else value)
@@ -0,0 +1,41 @@
+"""Reading Interfile headers (e.g. as written by STIR) & memory-mapping their data"""
+from pathlib import Path
+
+import numpy as np
+
+
+def read_interfile_header(filename) -> dict[str, str]:
+    """
+    Returns the "key := value" pairs of an Interfile header.
+    Keys are lower-case, without leading "!" and with normalised whitespace (including a single space before "[",
+    as e.g. STIR writes "data offset in bytes[1]" but "matrix size [1]").
+    """
+    header = {}
+    for line in Path(filename).read_text(errors="replace").splitlines():
+        key, sep, value = line.partition(":=")
+        if sep:
+            header[" ".join(key.strip().lstrip("!").lower().replace("[", " [").split())] = value.strip()
+    return header
+
+
+def interfile_dtype(header: dict[str, str]) -> np.dtype:
+    """Returns the data type of the payload described by an Interfile `header` (see `read_interfile_header`)"""
+    kind = {"float": "f", "signed integer": "i", "unsigned integer": "u"}[header.get("number format", "float").lower()]
+    order = ">" if header.get("imagedata byte order", "LITTLEENDIAN").upper() == "BIGENDIAN" else "<"
+    return np.dtype(f"{order}{kind}{header.get('number of bytes per pixel', '4')}")
+
+
+def read_interfile_memmap(filename) -> np.memmap:
+    """
+    Returns a read-only memory-map of the data file of an Interfile header (e.g. "prompts.hs" or "OSEM_image.hv").
+    The shape is given by the "matrix size" keys (slowest varying first), or is flat if these are not constant
+    (e.g. number of sinograms per segment).
+    """
+    header = read_interfile_header(filename)
+    sizes = [
+        header[f"matrix size [{i}]"].strip("{} ").split(",")
+        for i in range(int(header.get("number of dimensions", 3)), 0, -1)]
+    return np.memmap(
+        Path(filename).parent / header["name of data file"], dtype=interfile_dtype(header), mode="r",
+        offset=int(header.get("data offset in bytes [1]", 0)),
+        shape=tuple(int(size[0]) for size in sizes) if all(len(set(size)) == 1 for size in sizes) else None)
@@ -0,0 +1,147 @@
+"""`IterateStore`: append-only store of (compressed) iterates in a single file"""
+from __future__ import annotations
+
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+
+
+class _Deflater:
+    """Write-only file-like object, deflating into `fd` & keeping the compressed `size` & CRC-32 of the data"""
+    def __init__(self, fd, compresslevel: int):
+        self.fd = fd
+        self.zlib = zlib.compressobj(compresslevel)
+        self.size = self.crc = 0
+
+    def write(self, data) -> int:
+        self.crc = zlib.crc32(data, self.crc)
+        self._write(self.zlib.compress(data))
+        return len(data)
+
+    def _write(self, compressed: bytes):
+        self.fd.write(compressed)
+        self.size += len(compressed)
+
+    def close(self):
+        self._write(self.zlib.flush())
+
+
+class _Inflater:
+    """Read-only file-like object, inflating `size` bytes from `fd` & keeping the CRC-32 of the data"""
+    def __init__(self, fd, size: int):
+        self.fd = fd
+        self.remaining = size
+        self.zlib = zlib.decompressobj()
+        self.crc = 0
+
+    def read(self, n: int = -1) -> bytes:
+        chunks, size = [], 0
+        while (n < 0 or size < n) and not self.zlib.eof:
+            if not (compressed := self.zlib.unconsumed_tail):
+                if not (compressed := self.fd.read(min(self.remaining, 1 << 20))):
+                    break
+                self.remaining -= len(compressed)
+            chunks.append(chunk := self.zlib.decompress(compressed, max(n - size, 0)))
+            size += len(chunk)
+        res = b"".join(chunks)
+        self.crc = zlib.crc32(res, self.crc)
+        return res
+
+
+class IterateStore:
+    """
+    Append-only store of (compressed) iterates in a single file, indexed by iteration number.
+    Each record is a `RECORD` header (magic, iteration, compressed size, CRC-32 of the data)
+    followed by the deflated `.npy` serialisation of the iterate (written & read in chunks).
+    The index is read (from the headers only) on construction & updated by `append`.
+    NB: a header is only completed after its data is written, such that a crash (e.g. preemption) while appending
+    loses at most the iterate being written (the incomplete record is ignored & overwritten by the next `append`).
+    NB: re-appending an iteration (e.g. after resuming) supersedes its previous record.
+    """
+    RECORD = struct.Struct("<8sqQI")
+    MAGIC = b"PETRICIT"
+
+    def __init__(self, filename, compresslevel: int = 1):
+        self.filename = Path(filename)
+        self.compresslevel = compresslevel
+        self._scan()
+
+    def _records(self) -> Iterator[tuple[int, int, int, int]]:
+        """Yields `(iteration, offset, size, crc)` of the data of each complete record, in file order"""
+        if not self.filename.is_file():
+            return
+        filesize = self.filename.stat().st_size
+        with self.filename.open("rb") as fd:
+            while len(header := fd.read(self.RECORD.size)) == self.RECORD.size:
+                magic, iteration, size, crc = self.RECORD.unpack(header)
+                if magic != self.MAGIC or size == 0 or (offset := fd.tell()) + size > filesize:
+                    return
+                yield iteration, offset, size, crc
+                fd.seek(size, os.SEEK_CUR)
+
+    def _scan(self):
+        self._index: dict[int, tuple[int, int, int]] = {}
+        self._end = 0
+        for iteration, offset, size, crc in self._records():
+            self._index[iteration] = offset, size, crc
+            self._end = offset + size
+
+    def append(self, iteration: int, arr: np.ndarray):
+        with open(os.open(self.filename, os.O_RDWR | os.O_CREAT, 0o666), "r+b") as fd:
+            # NB: drops an incomplete record (if any)
+            fd.truncate(self._end)
+            fd.seek(self._end)
+            fd.write(self.RECORD.pack(self.MAGIC, iteration, 0, 0))
+            data = _Deflater(fd, self.compresslevel)
+            np.lib.format.write_array(data, np.asanyarray(arr), allow_pickle=False)
+            data.close()
+            fd.flush()
+            fd.seek(self._end)
+            fd.write(self.RECORD.pack(self.MAGIC, iteration, data.size, data.crc))
+        self._index[iteration] = self._end + self.RECORD.size, data.size, data.crc
+        self._end += self.RECORD.size + data.size
+
+    def truncate(self, iteration: int):
+        """
+        Removes records from the first one after `iteration` onwards
+        (e.g. left by a previous run when resuming from `iteration`).
+        """
+        if (offset := next((o for i, o, *_ in self._records() if i > iteration), None)) is not None:
+            with self.filename.open("r+b") as fd:
+                fd.truncate(offset - self.RECORD.size)
+            self._scan()
+
+    def checksums(self) -> dict[int, int]:
+        """CRC-32 of the (uncompressed) data of each iteration in the store"""
+        return {i: crc for i, (_, _, crc) in self._index.items()}
+
+    def iterations(self) -> list[int]:
+        """Sorted iteration numbers in the store"""
+        return sorted(self._index)
+
+    def __getitem__(self, iteration: int) -> np.ndarray:
+        offset, size, crc = self._index[iteration]
+        with self.filename.open("rb") as fd:
+            fd.seek(offset)
+            arr = np.lib.format.read_array(data := _Inflater(fd, size), allow_pickle=False)
+        if data.crc != crc:
+            raise ValueError(f"{self.filename}: CRC mismatch for iteration {iteration}")
+        return arr
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def checksum(self, iteration: int) -> int:
+        """CRC-32 of the (uncompressed) data of `iteration`"""
+        return self._index[iteration][2]
+
+    def read(self, iters: Iterable[int] | None = None) -> Iterator[tuple[int, np.ndarray]]:
+        """Yields `(iteration, array)` for `iters` (default: all, sorted), reading one at a time"""
+        for i in self.iterations() if iters is None else iters:
+            yield i, self[i]
+
+    __iter__ = read
@@ -0,0 +1,67 @@
+"""Evaluation of image-quality metrics (see `petric.QualityMetrics`)"""
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+
+
+class PassDetector:
+    """
+    Streaming detector of metrics "passing" their `thresholds`, i.e. remaining `<=` for `window` consecutive updates.
+    Each `update` is O(1) in the number of updates and `window` (run-lengths & a ring buffer of the last `window`
+    updates' `(index, iteration, time)`).
+
+    `passes[j]` is the `(index, iteration, time)` of the start of the first passing window of metric `j` (or `None`),
+    and `passed` the same for all metrics together.
+    """
+    def __init__(self, thresholds: Iterable[float], window: int = 10):
+        self.thresholds = np.asanyarray(thresholds)
+        assert self.thresholds.ndim == 1
+        self.window = window
+        self.runs = np.zeros(len(self.thresholds), dtype=int) # consecutive updates each metric has been passing
+        self.run = 0                                          # consecutive updates all metrics have been passing
+        self.passes: list[tuple | None] = [None] * len(self.thresholds)
+        self.passed: tuple | None = None
+        self.index = 0
+        self._ring: list[tuple] = [()] * window
+
+    def update(self, metrics: Iterable[float], iteration: int | None = None, time: float | None = None) -> list[int]:
+        """Adds an entry of `metrics` and returns the indices of metrics which newly passed"""
+        ok = np.asanyarray(metrics) <= self.thresholds
+        self.runs = np.where(ok, self.runs + 1, 0)
+        self.run = self.run + 1 if ok.all() else 0
+        self._ring[self.index % self.window] = (self.index, iteration, time)
+        self.index += 1
+        start = self._ring[self.index % self.window] # entry `window - 1` updates ago
+        if self.passed is None and self.run >= self.window:
+            self.passed = start
+        newly_passed = [j for j in np.flatnonzero(self.runs >= self.window) if self.passes[j] is None]
+        for j in newly_passed:
+            self.passes[j] = start
+        return newly_passed
+
+
+class RegionMetrics:
+    """
+    RMSE in the first two `regions` (e.g. whole object & background) and absolute error of the mean in the others
+    (e.g. VOIs), of an image vs `reference`, relative to `norm` (the mean of `reference` in the second region).
+    NB: precomputes the flat voxel indices of all regions, concatenated with a region label per voxel,
+    so that each evaluation needs a single gather & `np.bincount` reductions (regions may overlap).
+    """
+    def __init__(self, reference: np.ndarray, regions: Iterable[np.ndarray]):
+        """regions: boolean masks (of the same shape as `reference`)"""
+        region_indices = [np.flatnonzero(region) for region in regions]
+        self.indices = np.concatenate(region_indices)
+        self.labels = np.repeat(np.arange(len(region_indices)), [len(i) for i in region_indices])
+        self.counts = np.bincount(self.labels, minlength=len(region_indices))
+        self.ref_values = reference.ravel()[self.indices].astype(np.float64)
+        self.norm = self.ref_values[self.labels == 1].mean()
+
+    def __call__(self, image: np.ndarray) -> np.ndarray:
+        """The metrics of `image` (in order of `regions`)"""
+        # NB: float64 (as `ref_values`) & mean(test - ref) == mean(test) - mean(ref) over each region
+        diff = image.ravel()[self.indices] - self.ref_values
+        mean_diff = np.bincount(self.labels, weights=diff, minlength=len(self.counts)) / self.counts
+        mean_sq_diff = np.bincount(self.labels, weights=diff * diff, minlength=len(self.counts)) / self.counts
+        return np.concatenate((np.sqrt(mean_sq_diff[:2]), np.abs(mean_diff[2:]))) / self.norm
@@ -0,0 +1,103 @@
+"""Running `petric.run_submission` in isolated (spawned) worker processes, e.g. several datasets in parallel"""
+from __future__ import annotations
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from multiprocessing import get_context
+from pathlib import Path
+
+from petric import create_metrics, run_submission
+
+log = logging.getLogger('petric_tools.parallel')
+
+#: tqdm position of this (worker) process (see `run_parallel`)
+_worker_position = 0
+
+
+def _init_worker(positions):
+    """`ProcessPoolExecutor` initializer, taking a unique tqdm position from the `positions` queue"""
+    global _worker_position
+    _worker_position = positions.get()
+
+
+def _run_submission_in_worker(srcdir: Path, outdir: Path, log_level: int, position: int | None = None,
+                              submission: str = "main", **kwargs) -> dict:
+    """
+    `run_submission` in a (spawned) worker process, with its own logging, tqdm position and timeout.
+    position: defaults to the worker's (see `_init_worker`).
+    `kwargs` are passed to `create_metrics`.
+    """
+    from tqdm.auto import tqdm
+
+    position = _worker_position if position is None else position
+    logging.basicConfig(level=log_level)
+    metrics = create_metrics(srcdir, outdir, tqdm_class=partial(tqdm, position=position), **kwargs)
+    try:
+        return run_submission(srcdir, outdir, metrics, submission)
+    finally:
+        # NB: the worker process may be reused
+        metrics[0].tb.close()
+
+
+#: environment variables setting the number of threads of (multi-threaded) libraries
+THREAD_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+@contextmanager
+def environ(**env: str):
+    """Temporarily sets environment variables `env` (restoring previous values on exit)"""
+    previous = {var: os.environ.get(var) for var in env}
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        for var, value in previous.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def run_isolated(srcdir: Path, outdir: Path, submission: str = "main", **kwargs) -> dict:
+    """
+    `run_submission` in a fresh (spawned) process, e.g. so that imports & peak memory are isolated.
+    `kwargs` are passed to `create_metrics`.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(_run_submission_in_worker, srcdir, outdir, log.getEffectiveLevel(), 0, submission,
+                               **kwargs).result()
+
+
+def run_parallel(data_dirs: list[tuple[Path, Path]], jobs: int, threads: int | None = None) -> list[dict]:
+    """
+    Runs `run_submission` for each `(srcdir, outdir)` in `data_dirs`, `jobs` at a time in isolated worker processes
+    (each with its own `MessageRedirector` and `MetricsWithTimeout`), using `threads` threads per worker.
+    Returns the summaries (in order of `data_dirs`). Those of failed workers (e.g. killed by the OS) have status
+    "error" and the exception as "error", such that other datasets' summaries are kept.
+    """
+    threads = threads or max((os.cpu_count() or 1) // jobs, 1)
+    log.info("running %d datasets, %d at a time with %d threads each", len(data_dirs), jobs, threads)
+    context = get_context("spawn")
+    positions = context.Queue()
+    for position in range(jobs):
+        positions.put(position)
+    # NB: inherited by (spawned) workers, so must be set before they import multi-threaded libraries
+    with environ(**dict.fromkeys(THREAD_VARS, str(threads))):
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=_init_worker,
+                                 initargs=(positions,)) as executor:
+            futures = [
+                executor.submit(_run_submission_in_worker, srcdir, outdir, log.getEffectiveLevel())
+                for srcdir, outdir in data_dirs]
+            summaries = []
+            for (_, outdir), future in zip(data_dirs, futures):
+                try:
+                    summaries.append(future.result())
+                except Exception as exc:
+                    log.error("%s failed: %r", outdir.name, exc)
+                    summaries.append({
+                        "dataset": outdir.name, "status": "error", "iterations": 0, "time": float("nan"),
+                        "wall_time": float("nan"), "error": repr(exc)})
+            return summaries
@@ -0,0 +1,126 @@
+"""`Profiler`: per-iteration timings & sampled call stacks of named phases (see `petric.MetricsWithTimeout`)"""
+from __future__ import annotations
+
+import csv
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from heapq import heappush, heapreplace
+from pathlib import Path
+from threading import Event, Thread, get_ident
+from time import perf_counter, process_time
+from typing import TYPE_CHECKING, Callable
+
+import numpy as np
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None # type: ignore
+if TYPE_CHECKING:
+    from tensorboardX import SummaryWriter
+
+
+def peak_rss() -> float:
+    """Peak resident set size (MB) of this process so far (`nan` if unavailable)"""
+    if resource is None:
+        return float("nan")
+    # NB: Linux reports kB, macOS bytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+class Profiler:
+    """
+    Per-iteration wall time, (process) CPU time & peak RSS of named phases (see `phase` & `wrap`),
+    logged to TensorBoard (`profile/{phase}/{wall,cpu,peak_rss}`) & `csv_file` by `end_iteration`.
+
+    slowest: number of slowest iterations for which to keep sampled call stacks
+      (in "collapsed" flamegraph format `stacks_dir/iter_{iteration:04d}.txt`), or 0 to disable sampling.
+    NB: peak RSS is the process-wide maximum so far (i.e. when a phase increased it).
+    """
+    def __init__(self, tb: SummaryWriter | None, csv_file, slowest: int = 0, stacks_dir=None,
+                 sample_interval: float = 0.005):
+        self.tb = tb
+        self.timings: dict[str, list[float]] = {}
+        self.csv_file = Path(csv_file)
+        self.csv_file.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = self.csv_file.open("w", newline="")
+        self._csv = csv.writer(self._fd)
+        self._csv.writerow(("iter", "phase", "wall", "cpu", "peak_rss"))
+        self._last = perf_counter()
+        self.slowest = slowest
+        self._heap: list[tuple[float, int]] = []
+        self._stacks: Counter = Counter()
+        self._stop = Event()
+        if slowest > 0:
+            self.stacks_dir = Path(stacks_dir or self.csv_file.with_suffix(""))
+            self.stacks_dir.mkdir(parents=True, exist_ok=True)
+            self._thread_id = get_ident()
+            Thread(target=self._sampler, args=(sample_interval,), daemon=True).start()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Times the enclosed code, accumulating into the current iteration's `timings[name]`"""
+        wall, cpu = perf_counter(), process_time()
+        try:
+            yield
+        finally:
+            timing = self.timings.setdefault(name, [0.0, 0.0, 0.0])
+            timing[0] += perf_counter() - wall
+            timing[1] += process_time() - cpu
+            timing[2] = peak_rss()
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        """Returns `func` timed as phase `name`"""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def end_iteration(self, iteration: int, walltime: float | None = None):
+        """Logs & resets `timings`"""
+        wall = (now := perf_counter()) - self._last
+        self._last = now
+        self.timings["iteration"] = [wall, float("nan"), peak_rss()]
+        for name, timing in self.timings.items():
+            self._csv.writerow((iteration, name, *timing))
+            if self.tb is not None:
+                for tag, value in zip(("wall", "cpu", "peak_rss"), timing):
+                    if np.isfinite(value):
+                        self.tb.add_scalar(f"profile/{name}/{tag}", value, iteration, walltime)
+        self.timings = {}
+        if self.slowest > 0:
+            self._stacks, stacks = Counter(), self._stacks
+            if len(self._heap) < self.slowest:
+                heappush(self._heap, (wall, iteration))
+            elif wall > self._heap[0][0]:
+                self.stacks_file(heapreplace(self._heap, (wall, iteration))[1]).unlink(missing_ok=True)
+            else:
+                return
+            with self.stacks_file(iteration).open("w") as fd:
+                fd.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def stacks_file(self, iteration: int) -> Path:
+        return self.stacks_dir / f"iter_{iteration:04d}.txt"
+
+    def _sampler(self, interval: float):
+        """Samples the profiled thread's call stack every `interval` seconds"""
+        while not self._stop.wait(interval):
+            if (frame := sys._current_frames().get(self._thread_id)) is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(f"{Path(frame.f_code.co_filename).name}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+
+    def flush(self):
+        if not self._fd.closed:
+            self._fd.flush()
+
+    def close(self):
+        self._stop.set()
+        self._fd.close()
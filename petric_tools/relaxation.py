@@ -0,0 +1,72 @@
+"""
+Step-size rules for `BSREM`-like algorithms (i.e. with a `step_size()` method), e.g.
+
+>>> class Submission(StepSizeRuleMixin, BSREM1):
+...     step_size_rule = TimeBudgetRelaxation()
+"""
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING
+
+from cil.optimisation.algorithms import Algorithm
+from cil.optimisation.utilities import StepSizeRule
+
+if TYPE_CHECKING:
+    from petric import MetricsWithTimeout
+
+
+class TimeBudgetRelaxation(StepSizeRule):
+    """
+    BSREM step size `initial_step_size / (1 + relaxation_eta * epoch)`, with `relaxation_eta` adapted such that the
+    step size decays to `final_fraction * initial_step_size` by the end of the budget.
+    The budget is the earliest of `max_iteration` (if set), `algorithm.max_iteration` and the timeout
+    (`timeout.remaining` divided by the time per update, measured online from `timeout.elapsed`).
+    timeout: `petric.MetricsWithTimeout`.
+    NB: `main_BSREM.Submission.run` defaults `timeout` (`max_iteration`) to the `MetricsWithTimeout`
+    (smallest `MaxIteration`) amongst its `callbacks`.
+    NB: the step size never increases. Without a (finite) budget, `relaxation_eta` is kept fixed and the step size
+    decays per (integer) epoch, as in `BSREM1`.
+    """
+    def __init__(self, initial_step_size: float = .3, relaxation_eta: float = .01, final_fraction: float = .1,
+                 timeout: MetricsWithTimeout | None = None, max_iteration: int | None = None, smoothing: float = .1):
+        self.initial_step_size = initial_step_size
+        self.relaxation_eta = relaxation_eta
+        self.final_fraction = final_fraction
+        self.timeout = timeout
+        self.max_iteration = max_iteration
+        self.smoothing = smoothing
+        self.update_time = None # exponential moving average (seconds per update)
+        self.step_size = initial_step_size
+        self._last = None       # (iteration, elapsed)
+
+    def get_step_size(self, algorithm: Algorithm) -> float:
+        max_iteration = getattr(algorithm, "max_iteration", math.inf)
+        if self.max_iteration is not None:
+            max_iteration = min(max_iteration, self.max_iteration)
+        remaining_updates = max_iteration - algorithm.iteration
+        if (timeout := self.timeout) is not None:
+            if self._last is not None and algorithm.iteration > self._last[0]:
+                update_time = (timeout.elapsed - self._last[1]) / (algorithm.iteration - self._last[0])
+                self.update_time = update_time if self.update_time is None else (
+                    self.smoothing * update_time + (1 - self.smoothing) * self.update_time)
+            self._last = algorithm.iteration, timeout.elapsed
+            if self.update_time:
+                remaining_updates = min(remaining_updates, timeout.remaining / self.update_time)
+        if 0 < remaining_updates < math.inf:
+            epoch = algorithm.iteration / algorithm.num_subsets
+            self.relaxation_eta = (1 / self.final_fraction - 1) / (epoch + remaining_updates / algorithm.num_subsets)
+        else:
+            epoch = algorithm.iteration // algorithm.num_subsets
+        self.step_size = min(self.step_size, self.initial_step_size / (1 + self.relaxation_eta * epoch))
+        return self.step_size
+
+
+class StepSizeRuleMixin:
+    """Uses `step_size_rule.get_step_size(self)` (if `step_size_rule` is set) as `step_size()`"""
+    step_size_rule: StepSizeRule | None = None
+
+    def step_size(self) -> float:
+        if self.step_size_rule is None:
+            return super().step_size()
+        return self.step_size_rule.get_step_size(self)
@@ -0,0 +1,111 @@
+"""`SubsetCache`: persistent on-disk cache of data derived from a `Dataset` (e.g. subset sensitivities)"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+from petric_tools import CACHEDIR, lazy_import
+from petric_tools.interfile import read_interfile_header
+
+if TYPE_CHECKING:
+    from petric import Dataset
+
+STIR = lazy_import("sirf.STIR")
+log = logging.getLogger('petric_tools.subset_cache')
+
+
+def file_digest(filename, cachedir=CACHEDIR) -> str:
+    """
+    Returns the (hex) BLAKE2 digest of the contents of `filename` (including the data file for an Interfile header).
+    Digests are memoised in `cachedir` (keyed on path, size and modification time).
+    """
+    path = Path(filename).resolve()
+    memo_file = cachedir / "digests.json"
+    memo = json.loads(memo_file.read_text()) if memo_file.is_file() else {}
+    files = [path]
+    if path.suffix in (".hs", ".hv", ".h33"):
+        files.append(path.parent / read_interfile_header(path)["name of data file"])
+    stamp = [[f.stat().st_size, f.stat().st_mtime_ns] for f in files]
+    if (entry := memo.get(str(path))) is not None and entry["stamp"] == stamp:
+        return entry["digest"]
+    digest = hashlib.blake2b()
+    for f in files:
+        with f.open("rb") as fd:
+            while chunk := fd.read(1 << 24):
+                digest.update(chunk)
+    memo[str(path)] = {"stamp": stamp, "digest": digest.hexdigest()}
+    cachedir.mkdir(parents=True, exist_ok=True)
+    (tmp := memo_file.with_suffix(f".{os.getpid()}.tmp")).write_text(json.dumps(memo))
+    tmp.replace(memo_file)
+    return memo[str(path)]["digest"]
+
+
+def image_geometry(image: STIR.ImageData) -> dict[str, list]:
+    """Dimensions, voxel sizes & offset (in mm) of `image`"""
+    return {
+        "dimensions": [int(n) for n in image.dimensions()], "voxel_sizes": [float(v) for v in image.voxel_sizes()],
+        "offset": [float(v) for v in image.get_geometrical_info().get_offset()]}
+
+
+class SubsetCache:
+    """
+    Persistent on-disk cache of data derived from a `Dataset` for a given number of subsets and partition `mode`,
+    e.g. subset indices and (subset) sensitivities. Entries are computed on first use, and reused across runs
+    (and algorithms) as long as the data files and the image geometry (of `data.OSEM_image`) are unchanged.
+
+    >>> cache = SubsetCache(data, num_subsets, "staggered")
+    >>> partitions_idxs = cache.indices("partitions", lambda: partition_indices(num_subsets, views, stagger=True))
+    >>> sensitivity = cache.image("sensitivity_0", lambda: acq_model.backward(mult_factors_subset))
+    """
+    FILES = ("prompts.hs", "additive_term.hs", "mult_factors.hs")
+
+    def __init__(self, data: Dataset, num_subsets: int, mode: str = "staggered", cachedir=CACHEDIR, **params):
+        """
+        cachedir: root directory of the cache (`None` to disable caching, i.e. always compute).
+        params: any other settings which the cached data depends on (e.g. the acquisition model).
+        """
+        self.dir: Path | None = None
+        if cachedir is None:
+            return
+        # NB: the image geometry rather than `OSEM_image.hv`, as datasets may share `data.path` but not the image grid
+        # (e.g. `zoom_dataset`) or have a different (e.g. warm-start) initial image on the same grid
+        key = {
+            "files": [file_digest(Path(data.path) / fname, cachedir) for fname in self.FILES],
+            "image": image_geometry(data.OSEM_image), "num_subsets": num_subsets, "mode": mode, **params}
+        key_json = json.dumps(key, sort_keys=True, default=str)
+        self.dir = Path(cachedir) / hashlib.blake2b(key_json.encode(), digest_size=16).hexdigest()
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def indices(self, name: str, compute: Callable[[], list]) -> list:
+        """Returns the cached (JSON-serialisable) `name` if present, otherwise `compute()` and caches it"""
+        if self.dir is None:
+            return compute()
+        if (cached := self.dir / f"{name}.json").is_file():
+            log.debug("using cached %s", cached)
+            return json.loads(cached.read_text())
+        value = compute()
+        (tmp := self.dir / f".{name}.{os.getpid()}.json").write_text(json.dumps(value))
+        tmp.replace(cached)
+        return value
+
+    def image(self, name: str, compute: Callable[[], STIR.ImageData]) -> STIR.ImageData:
+        """Returns the cached image `name` if present, otherwise `compute()` and caches it"""
+        if self.dir is None:
+            return compute()
+        if (cached := self.dir / f"{name}.hv").is_file():
+            log.debug("using cached %s", cached)
+            return STIR.ImageData(str(cached))
+        value = compute()
+        # write in a temporary directory, then move data & header (in that order) such that readers never see
+        # incomplete files (NB: the header refers to the data file by its name relative to the header)
+        (tmpdir := self.dir / f".tmp.{os.getpid()}").mkdir(exist_ok=True)
+        value.write(str(tmpdir / f"{name}.hv"))
+        for tmp in sorted(tmpdir.glob(f"{name}.*"), key=lambda f: f.suffix == ".hv"):
+            tmp.replace(self.dir / tmp.name)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        return value
@@ -0,0 +1,141 @@
+"""
+`WarmStartBank`: persistent on-disk store of the best iterates of previous runs, for use as initial images
+(see `petric.get_data(warm_start=...)`), filled by the `SaveWarmStart` callback.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from functools import partial
+from pathlib import Path
+from time import time_ns
+from typing import TYPE_CHECKING, Callable
+
+import numpy as np
+
+from cil.optimisation.algorithms import Algorithm
+from petric import Snapshot, SnapshotCallback, read_penalisation_factor
+from petric_tools import CACHEDIR, lazy_import
+from petric_tools.checkpoint import jsonable
+from petric_tools.subset_cache import file_digest
+
+if TYPE_CHECKING:
+    from petric import Dataset
+
+STIR = lazy_import("sirf.STIR")
+log = logging.getLogger('petric_tools.warm_start')
+
+
+class WarmStartBank:
+    """
+    Persistent on-disk store of the best iterate (lowest `score`, e.g. `reference_distance`) reached by previous runs,
+    per dataset and prior (keyed on the data files & penalisation factor), for use as initial image.
+
+    >>> bank = WarmStartBank()
+    >>> data = get_data(srcdir, warm_start=bank) # `data.OSEM_image` is the best banked image (if any)
+    >>> algo = Submission(data)
+    >>> algo.run(..., callbacks=[SaveWarmStart(bank, data, interval=100)])
+    """
+    FILES = ("prompts.hs", "additive_term.hs", "mult_factors.hs", "OSEM_image.hv", "kappa.hv")
+
+    def __init__(self, bankdir=CACHEDIR / "warm_start", cachedir=CACHEDIR):
+        """cachedir: where `file_digest` memoises the digests of the data files"""
+        self.dir = Path(bankdir)
+        self.cachedir = Path(cachedir)
+
+    def key(self, srcdir, penalisation_factor: float | None = None, **params) -> str:
+        """
+        penalisation_factor: defaults to `read_penalisation_factor(srcdir)`.
+          NB: rounded to `float32` (as stored by sirf.STIR priors), such that e.g. `prior.get_penalisation_factor()`
+          gives the same key.
+        params: any other settings which the objective depends on (e.g. other prior parameters).
+        """
+        if penalisation_factor is None:
+            penalisation_factor = read_penalisation_factor(srcdir)
+        key = {
+            "files": [file_digest(Path(srcdir) / fname, self.cachedir) for fname in self.FILES],
+            "penalisation_factor": float(np.float32(penalisation_factor)), **params}
+        return hashlib.blake2b(json.dumps(key, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+    def entry(self, key: str) -> dict | None:
+        """Metadata (incl. "score") of the banked image for `key`, if any"""
+        if (meta := self.dir / key / "warm_start.json").is_file():
+            return json.loads(meta.read_text())
+        return None
+
+    def get(self, srcdir, penalisation_factor: float | None = None, **params) -> STIR.ImageData | None:
+        """Returns the banked image (if any). Arguments as in `key`"""
+        key = self.key(srcdir, penalisation_factor, **params)
+        if (entry := self.entry(key)) is None:
+            return None
+        log.info("warm start from %s (score %.4g)", entry.get("source"), entry["score"])
+        return STIR.ImageData(str(self.dir / key / entry["image"]))
+
+    def put(self, image: STIR.ImageData, score: float, srcdir, penalisation_factor: float | None = None,
+            info: dict | None = None, key: str | None = None, **params) -> bool:
+        """
+        Banks `image` if its `score` is lower than that of the currently banked image (if any).
+        info: other (JSON-serialisable) metadata (e.g. submission & iteration).
+        key: defaults to `key(srcdir, penalisation_factor, **params)`.
+        Returns whether `image` was banked.
+        """
+        if key is None:
+            key = self.key(srcdir, penalisation_factor, **params)
+        if (entry := self.entry(key)) is not None and entry["score"] <= score:
+            return False
+        (keydir := self.dir / key).mkdir(parents=True, exist_ok=True)
+        # unique name, and metadata replaced atomically after writing the image (as in `Checkpoint`),
+        # such that concurrent runs (and readers) always see a complete entry
+        stem = f"image_{os.getpid()}_{time_ns()}"
+        image.write(str(keydir / f"{stem}.hv"))
+        meta = {"image": f"{stem}.hv", "score": score, "source": str(srcdir), **jsonable(info or {})}
+        (tmp := keydir / f".warm_start.{os.getpid()}.json").write_text(json.dumps(meta, indent=2))
+        tmp.replace(keydir / "warm_start.json")
+        if entry is not None and entry["image"] != meta["image"]:
+            for old in keydir.glob(f"{Path(entry['image']).stem}.*"):
+                old.unlink(missing_ok=True)
+        return True
+
+
+def reference_distance(image: np.ndarray, reference: np.ndarray, mask: np.ndarray) -> float:
+    """
+    RMSE between `image[mask]` & `reference`, relative to the mean of `reference`.
+    NB: `reference` is already masked (i.e. `reference_image.as_array()[mask]`), such that it can be precomputed.
+    """
+    return float(np.sqrt(np.mean((image[mask] - reference)**2)) / abs(reference.mean()))
+
+
+class SaveWarmStart(SnapshotCallback):
+    """
+    Banks `algo.x` in `bank` every `interval` iterations, if it improves on the banked `score` of `snapshot.array`
+    (default: `reference_distance` in `data.whole_object_mask`).
+    NB: add to `MetricsWithTimeout.callbacks` such that its time is excluded from the timeout.
+    NB: keyed (as in `get_data`) on `read_penalisation_factor(data.path)` rather than on `data.prior`
+    (which Submissions may modify).
+    """
+    def __init__(self, bank: WarmStartBank, data: Dataset, interval: int = 100,
+                 score: Callable[[np.ndarray], float] | None = None, **kwargs):
+        super().__init__(interval=interval, **kwargs)
+        self.bank = bank
+        self.srcdir = data.path
+        self.key = bank.key(self.srcdir)
+        if score is None:
+            if data.reference_image is None:
+                raise ValueError("need a `score` for data without reference image")
+            mask = data.whole_object_mask.as_array().astype(bool)
+            score = partial(reference_distance, reference=data.reference_image.as_array()[mask], mask=mask)
+        self.score = score
+
+    def skip_iteration(self, algo: Algorithm) -> bool:
+        # NB: independent of `algo.update_objective_interval`
+        return algo.iteration <= 0 or algo.iteration % self.interval != 0
+
+    def __call__(self, algo: Algorithm, snapshot: Snapshot | None = None):
+        if self.skip_iteration(algo):
+            return
+        score = self.score(algo.x.as_array() if snapshot is None else snapshot.array)
+        if self.bank.put(algo.x, score, self.srcdir, key=self.key,
+                         info={"algorithm": type(algo).__name__, "iteration": algo.iteration}):
+            log.debug("banked iteration %d (score %.4g)", algo.iteration, score)
@@ -0,0 +1,36 @@
+"""`connected_component` ranks the components of a mask by size"""
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+connected_component = pytest.importorskip("SIRF_data_preparation.VOI_utilities").connected_component
+
+
+@pytest.fixture
+def arr():
+    """2D mask with components of 6, 9 & 2 voxels (in order of labelling)"""
+    arr = np.zeros((8, 8), dtype=bool)
+    arr[0, :6] = True
+    arr[3:6, 3:6] = True
+    arr[7, 6:] = True
+    return arr
+
+
+def test_order(arr):
+    for order, size in enumerate([9, 6, 2]):
+        component = connected_component(arr, order)
+        assert component.sum() == size
+        assert not (component & ~arr).any()
+    np.testing.assert_array_equal(connected_component(arr), connected_component(arr, 0))
+    assert (sum(connected_component(arr, order) for order in range(3)) == arr).all()
+
+
+@pytest.mark.parametrize("order", [3, 4])
+def test_order_too_large(arr, order):
+    with pytest.raises(ValueError, match="only 3 connected components"):
+        connected_component(arr, order)
+
+
+def test_empty():
+    with pytest.raises(ValueError):
+        connected_component(np.zeros((4, 4), dtype=bool))
@@ -0,0 +1,66 @@
+"""`IterateStore` round-trips iterates, truncates when resuming & ignores records left incomplete by a crash"""
+import pytest
+
+np = pytest.importorskip("numpy")
+IterateStore = pytest.importorskip("petric_tools.iterate_store").IterateStore
+
+
+@pytest.fixture
+def iterates() -> dict:
+    rng = np.random.default_rng(0)
+    return {i: rng.random((3, 16, 16), dtype=np.float32) for i in range(0, 50, 10)}
+
+
+@pytest.fixture
+def store(tmp_path, iterates) -> IterateStore:
+    store = IterateStore(tmp_path / "iters.dat")
+    for i, arr in iterates.items():
+        store.append(i, arr)
+    return store
+
+
+def assert_contains(store: IterateStore, iterates: dict):
+    assert store.iterations() == sorted(iterates)
+    for i, arr in store:
+        assert arr.dtype == iterates[i].dtype
+        np.testing.assert_array_equal(arr, iterates[i])
+
+
+def test_round_trip(store, iterates):
+    assert len(store) == len(iterates)
+    assert_contains(store, iterates)
+    assert_contains(IterateStore(store.filename), iterates)
+    assert IterateStore(store.filename).checksums() == store.checksums()
+
+
+def test_append_supersedes(store, iterates):
+    store.append(20, zeros := np.zeros_like(iterates[20]))
+    assert_contains(IterateStore(store.filename), {**iterates, 20: zeros})
+
+
+def test_truncate(store, iterates):
+    store.truncate(20)
+    kept = {i: arr for i, arr in iterates.items() if i <= 20}
+    assert_contains(store, kept)
+    assert_contains(IterateStore(store.filename), kept)
+    store.append(30, iterates[40])
+    assert_contains(IterateStore(store.filename), {**kept, 30: iterates[40]})
+
+
+def test_incomplete_record(store, iterates):
+    # as left by a crash while appending: header (without size) followed by partial data
+    size = store.filename.stat().st_size
+    with store.filename.open("ab") as fd:
+        fd.write(IterateStore.RECORD.pack(IterateStore.MAGIC, 50, 0, 0) + b"partial data")
+    reopened = IterateStore(store.filename)
+    assert_contains(reopened, iterates)
+    reopened.append(50, iterates[0])
+    assert_contains(IterateStore(store.filename), {**iterates, 50: iterates[0]})
+    assert store.filename.stat().st_size == size + IterateStore.RECORD.size + reopened._index[50][1]
+
+
+def test_truncated_data(store, iterates):
+    # e.g. a copy of the file cut short
+    with store.filename.open("r+b") as fd:
+        fd.truncate(store.filename.stat().st_size - 1)
+    assert_contains(IterateStore(store.filename), {i: arr for i, arr in iterates.items() if i < 40})
@@ -0,0 +1,32 @@
+"""`normalise_header` streams (Siemens) Interfile headers, translating line endings (also in-place)"""
+import pytest
+
+data_utilities = pytest.importorskip("SIRF_data_preparation.data_utilities")
+
+HEADER = b"!INTERFILE:=\r%comment:=\x00x\r!name of data file:=norm.n\r!END OF INTERFILE:=\r"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_EOL(tmp_path, chunk_size):
+    fin, fout = tmp_path / "norm.n.hdr", tmp_path / "norm_stir.n.hdr"
+    fin.write_bytes(HEADER)
+    data_utilities.normalise_header(fin, fout, chunk_size=chunk_size)
+    assert fout.read_bytes() == HEADER.replace(b"\r", b"\n")
+    assert fin.read_bytes() == HEADER
+    assert sorted(tmp_path.iterdir()) == sorted([fin, fout]) # no temporary files left
+
+
+def test_in_place_delete(tmp_path):
+    f = tmp_path / "norm.n.hdr"
+    f.write_bytes(HEADER)
+    data_utilities.normalise_header(f, f, delete=b"\x00", chunk_size=5)
+    assert f.read_bytes() == HEADER.replace(b"\r", b"\n").replace(b"\x00", b"")
+    assert list(tmp_path.iterdir()) == [f]
+
+
+def test_fix_siemens_norm_EOL(tmp_path):
+    fin, fout = tmp_path / "norm.n.hdr", tmp_path / "norm_stir.n.hdr"
+    fin.write_bytes(HEADER)
+    data_utilities.fix_siemens_norm_EOL(str(fin), str(fout))
+    assert fout.read_bytes().splitlines() == HEADER.split(b"\r")[:-1]
+    assert b"\r" not in fout.read_bytes()
@@ -0,0 +1,41 @@
+"""`PassDetector` finds the same first passing windows as a brute-force search"""
+import pytest
+
+np = pytest.importorskip("numpy")
+PassDetector = pytest.importorskip("petric_tools.metrics").PassDetector
+
+
+def first_window(ok, window: int):
+    """Index of the first `window` consecutive `True` entries of `ok` (or `None`)"""
+    return next((i for i in range(len(ok) - window + 1) if ok[i:i + window].all()), None)
+
+
+@pytest.mark.parametrize("window", [1, 3, 10])
+def test_matches_brute_force(window):
+    rng = np.random.default_rng(window)
+    thresholds = np.array([.5, .2, .8])
+    # noisy & decreasing, so metrics pass (and fail again) at different updates
+    metrics = rng.uniform(0, 1, (200, len(thresholds))) * np.linspace(2, .1, 200)[:, None]
+    detector = PassDetector(thresholds, window)
+    newly_passed = []
+    for i, m in enumerate(metrics):
+        newly_passed.extend(detector.update(m, iteration=10 * i, time=.5 * i))
+
+    ok = metrics <= thresholds
+    start = first_window(ok.all(axis=1), window)
+    assert start is not None
+    assert detector.passed == (start, 10 * start, .5 * start)
+    for j in range(len(thresholds)):
+        start = first_window(ok[:, j], window)
+        assert detector.passes[j] == (start, 10 * start, .5 * start)
+    assert sorted(newly_passed) == list(range(len(thresholds)))
+
+
+def test_interrupted_run_does_not_pass():
+    detector = PassDetector([1.], window=3)
+    for m in [0, 0, 2, 0, 0]:
+        detector.update([m])
+    assert detector.passed is None and detector.passes == [None]
+    assert detector.run == 2
+    detector.update([0])
+    assert detector.passed == (3, None, None)
@@ -0,0 +1,36 @@
+"""`RegionMetrics` (used by `QualityMetrics.evaluate`) matches the original per-VOI evaluation"""
+import pytest
+
+np = pytest.importorskip("numpy")
+RegionMetrics = pytest.importorskip("petric_tools.metrics").RegionMetrics
+
+
+def per_voi_metrics(reference, test, whole_object_mask, background_mask, voi_masks) -> list[float]:
+    """`QualityMetrics.evaluate` before `RegionMetrics` (one masked reduction per region)"""
+    whole_object_indices, background_indices = np.where(whole_object_mask), np.where(background_mask)
+    norm = reference[background_indices].mean()
+    return [
+        np.sqrt(np.mean((reference[whole_object_indices] - test[whole_object_indices])**2)) / norm,
+        np.sqrt(np.mean((reference[background_indices] - test[background_indices])**2)) / norm] + [
+            np.abs(test[voi_indices].mean() - reference[voi_indices].mean()) / norm
+            for voi_indices in map(np.where, voi_masks)]
+
+
+def test_matches_per_voi_metrics():
+    rng = np.random.default_rng(0)
+    shape = (8, 32, 32)
+    reference = rng.uniform(1, 2, shape).astype(np.float32)
+    z, y, x = np.indices(shape)
+    whole_object_mask = (y - 16)**2 + (x - 16)**2 < 14**2
+    background_mask = whole_object_mask & ((y - 16)**2 + (x - 16)**2 > 6**2)
+    # overlapping VOIs, also with the background
+    voi_masks = [(y - 16)**2 + (x - 16)**2 < r**2 for r in (3, 5, 8)] + [(z == 1) & whole_object_mask]
+    region_metrics = RegionMetrics(reference, [whole_object_mask, background_mask, *voi_masks])
+    assert region_metrics.norm == pytest.approx(reference[background_mask].mean())
+    for scale in (1, 1.01, .5):
+        test = (reference * scale + rng.normal(0, .01, shape)).astype(np.float32)
+        # NB: `per_voi_metrics` takes `float32` means (i.e. AEM is only accurate to ~1e-7, vs thresholds ~1e-2)
+        np.testing.assert_allclose(region_metrics(test),
+                                   per_voi_metrics(reference, test, whole_object_mask, background_mask, voi_masks),
+                                   rtol=1e-5, atol=1e-6)
+    np.testing.assert_array_equal(region_metrics(reference), 0)
@@ -0,0 +1,62 @@
+"""`TimeBudgetRelaxation` decays the step size to `final_fraction * initial_step_size` by the end of the budget"""
+import math
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("cil")
+relaxation = pytest.importorskip("petric_tools.relaxation")
+
+
+def step_sizes(rule, iterations, num_subsets=5, max_iteration=math.inf, timeout=None, time_per_update=1.):
+    algorithm = SimpleNamespace(iteration=0, num_subsets=num_subsets, max_iteration=max_iteration)
+    steps = []
+    for i in iterations:
+        algorithm.iteration = i
+        if timeout is not None:
+            timeout.remaining -= i * time_per_update - timeout.elapsed
+            timeout.elapsed = i * time_per_update
+        steps.append(rule.get_step_size(algorithm))
+    return steps
+
+
+@pytest.mark.parametrize("bound_by", ["rule", "algorithm"])
+def test_max_iteration(bound_by):
+    rule = relaxation.TimeBudgetRelaxation(final_fraction=.1, max_iteration=100 if bound_by == "rule" else None)
+    steps = step_sizes(rule, range(101), max_iteration=100 if bound_by == "algorithm" else math.inf)
+    assert steps[0] == rule.initial_step_size
+    assert all(b <= a for a, b in zip(steps, steps[1:]))
+    assert steps[-1] == pytest.approx(.1 * rule.initial_step_size)
+
+
+def test_timeout():
+    timeout = SimpleNamespace(elapsed=0., remaining=50.)
+    rule = relaxation.TimeBudgetRelaxation(final_fraction=.2, timeout=timeout)
+    steps = step_sizes(rule, range(50), timeout=timeout, time_per_update=1.)
+    assert steps[0] == rule.initial_step_size
+    assert all(b <= a for a, b in zip(steps, steps[1:]))
+    # NB: one update before the end of the budget
+    assert steps[-1] == pytest.approx(.2 * rule.initial_step_size, rel=.05)
+
+
+def test_no_budget():
+    """As `BSREM1`, i.e. fixed `relaxation_eta` per (integer) epoch"""
+    rule = relaxation.TimeBudgetRelaxation(initial_step_size=.3, relaxation_eta=.01)
+    steps = step_sizes(rule, range(23), num_subsets=5)
+    assert steps == [.3 / (1 + .01 * (i // 5)) for i in range(23)]
+
+
+def test_mixin():
+    class Algorithm:
+        iteration, num_subsets, max_iteration = 10, 5, math.inf
+
+        def step_size(self):
+            return 1.
+
+    class WithRule(relaxation.StepSizeRuleMixin, Algorithm):
+        pass
+
+    algorithm = WithRule()
+    assert algorithm.step_size() == 1.
+    algorithm.step_size_rule = relaxation.TimeBudgetRelaxation(initial_step_size=.3, relaxation_eta=.5)
+    assert algorithm.step_size() == pytest.approx(.3 / 2)
@@ -0,0 +1,43 @@
+"""Warm starts banked by `SaveWarmStart` are found by `get_data(warm_start=...)`"""
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+STIR = pytest.importorskip("sirf.STIR")
+petric = pytest.importorskip("petric")
+warm_start = pytest.importorskip("petric_tools.warm_start")
+
+
+@pytest.fixture
+def srcdir(tmp_path):
+    """Minimal dataset: images on a small grid, placeholder sinograms (only digested) & `penalisation_factor.txt`"""
+    srcdir = tmp_path / "data"
+    srcdir.mkdir()
+    image = STIR.ImageData()
+    image.initialise((2, 8, 8))
+    image.fill(1)
+    image.write(str(srcdir / "OSEM_image.hv"))
+    image.write(str(srcdir / "kappa.hv"))
+    for name in ("prompts", "additive_term", "mult_factors"):
+        (srcdir / f"{name}.s").write_bytes(name.encode())
+        (srcdir / f"{name}.hs").write_text(f"!INTERFILE :=\n!name of data file := {name}.s\n!END OF INTERFILE :=\n")
+    # NB: not exactly representable as `float32` (as stored by the prior)
+    np.savetxt(srcdir / "penalisation_factor.txt", [1 / 700])
+    return srcdir
+
+
+def test_save_warm_start_found_by_get_data(srcdir, tmp_path):
+    bank = warm_start.WarmStartBank(tmp_path / "bank", cachedir=tmp_path / "cache")
+    data = petric.get_data(srcdir, outdir=None, read_sinos=False).load()  # as in `run_submission`
+    algo = SimpleNamespace(x=data.OSEM_image * 2, iteration=100)
+    warm_start.SaveWarmStart(bank, data, interval=100, score=lambda arr: 0.)(algo)
+
+    warm_data = petric.get_data(srcdir, outdir=None, read_sinos=False, warm_start=bank)
+    np.testing.assert_array_equal(warm_data.OSEM_image.as_array(), algo.x.as_array())
+
+
+def test_key_rounds_penalisation_factor(srcdir, tmp_path):
+    bank = warm_start.WarmStartBank(tmp_path / "bank", cachedir=tmp_path / "cache")
+    assert bank.key(srcdir, float(np.float32(1 / 700))) == bank.key(srcdir)
+    assert bank.key(srcdir, 2 / 700) != bank.key(srcdir)